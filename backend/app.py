@@ -1,14 +1,15 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import APIRouter, FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-import fitz  # PyMuPDF
 from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
 import os
 import sys
+import json
+import asyncio
 import logging
-from fastapi.staticfiles import StaticFiles
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -21,92 +22,440 @@ logger = logging.getLogger(__name__)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
+from utils.metrics import FEEDBACK_RECEIVED, MetricsMiddleware, render as render_metrics, timed
+from utils.static import PrecompressedStaticFiles
+
 try:
-    from classifier import classify_email
-    from chatbot import chat_with_ai
+    from classifier import classify_email_async, classify_emails_async, classify_email_stream
+    from chatbot import chat_with_ai_async, chat_with_ai_stream, chat_in_session_async, chat_in_session_stream
+    from chatbot import gemini as chat_gemini
+    from chatbot import SessionNotFound, open_session
+    from utils.responses import gemini as response_gemini
+    from utils.sessions import session_store
+    from model_registry import registry
+    from utils.concurrency import shutdown as shutdown_executor
+    from utils.extractor import UploadTooLarge, extract_file, spool_upload, preload as preload_extractor
+    from utils.cache import response_cache
+    from utils.similarity import similarity_index
+    from utils.concurrency import run_blocking
+    from utils.job_store import FINAL_STATUSES, job_store
+    from utils.mail_archive import MAILBOX_EXTENSIONS, is_mailbox_file
+    from jobs import submit_job
+    from utils.feedback import feedback_store, normalize_category
+    from model_updater import updater
 except ImportError as e:
     logger.error(f"Erro de importação: {e}")
     # Fallback para quando não conseguir importar
-    def classify_email(text: str):
+    async def classify_email_async(text: str):
         return {"categoria": "Erro", "resposta": "Erro no servidor. Modelo não carregado."}
     
-    def chat_with_ai(message: str, history: List):
+    async def classify_emails_async(texts: List[str], with_response: bool = True):
+        return [await classify_email_async(text) for text in texts]
+    
+    async def classify_email_stream(text: str):
+        yield "done", await classify_email_async(text)
+    
+    async def chat_with_ai_async(message: str, history: List):
         return {"resposta": "Erro no servidor. Chat não disponível."}
+    
+    async def chat_with_ai_stream(message: str, history: List):
+        yield "done", await chat_with_ai_async(message, history)
+    
+    async def chat_in_session_async(message: str, session_id: str = None, history: List = None):
+        return {"resposta": "Erro no servidor. Chat não disponível.", "session_id": session_id}
+    
+    async def chat_in_session_stream(message: str, session_id: str = None, history: List = None):
+        yield "done", await chat_in_session_async(message, session_id)
+
+    class SessionNotFound(Exception):
+        pass
+
+    def open_session(session_id: str = None, history: List = None):
+        raise SessionNotFound(session_id)
+
+    def shutdown_executor():
+        pass
+
+    class UploadTooLarge(Exception):
+        pass
+
+    async def spool_upload(file, suffix: str = "") -> str:
+        raise RuntimeError("Upload não disponível.")
+
+    async def extract_file(path: str, filename: str) -> str:
+        return ""
+
+    def preload_extractor():
+        pass
+
+    async def run_blocking(func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    MAILBOX_EXTENSIONS = ()
+    FINAL_STATUSES = ()
+
+    def is_mailbox_file(filename: str) -> bool:
+        return False
+
+    def submit_job(path: str, filename: str, with_response: bool = False):
+        raise RuntimeError("Jobs não disponíveis.")
+
+    job_store = None
 
-app = FastAPI(title="AutoU Email Classifier API", version="1.0.0")
+    def normalize_category(category: str):
+        return None
+
+    feedback_store = None
+    updater = None
+
+    registry = None
+    response_cache = None
+    session_store = None
+    chat_gemini = None
+    response_gemini = None
+
+# Tamanho máximo de lote aceito em /process_batch
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1000"))
+# Tamanho máximo (bytes) de uma exportação de caixa de email enviada a /jobs
+JOB_UPLOAD_MAX_BYTES = int(os.getenv("JOB_UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Intervalo (segundos) entre verificações de novos resultados no streaming NDJSON
+JOB_STREAM_POLL_INTERVAL = float(os.getenv("JOB_STREAM_POLL_INTERVAL", "0.5"))
+# Carrega o estado pesado já na importação do app. O gunicorn_conf.py liga esta
+# opção (preload no master); sem ela o servidor sobe rápido e aquece em segundo plano
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
 
 FRONTEND_DIST = Path(__file__).resolve().parent.parent / "frontend" / "dist"
-if FRONTEND_DIST.exists():
-    app.mount("/", StaticFiles(directory=str(FRONTEND_DIST), html=True), name="frontend")
-else:
-    logger.info("Frontend build não encontrado em %s — será necessário construir o frontend.", FRONTEND_DIST)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+
+router = APIRouter()
+
+def warmup():
+    """
+    Carrega o estado pesado e somente leitura (modelo; o matcher de keywords e
+    as partes estáticas dos caches já são montados na importação). Com
+    gunicorn --preload roda uma vez no master e é compartilhado via copy-on-write.
+    """
+    if registry is not None:
+        registry.load()
+
+def _warm_worker(app: FastAPI):
+    """
+    Recursos por worker, criados depois do fork: clientes do Gemini e
+    dependências pesadas. Roda em segundo plano enquanto o servidor já
+    aceita conexões; /ready indica quando terminou.
+    """
+    warmup()
+    preload_extractor()
+    llm = {}
+    for name, client in [("respostas", response_gemini), ("chat", chat_gemini)]:
+        llm[name] = client is not None and client.get() is not None
+    app.state.components = {
+        "modelo": registry.current.version if registry is not None and registry.current else None,
+        "llm": llm,
+    }
+    app.state.ready = True
+    logger.info("Worker aquecido e pronto")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if registry is not None:
+        registry.start()
+    if job_store is not None and job_store.available:
+        job_store.fail_orphans()
+    if updater is not None:
+        updater.start()
+    threading.Thread(target=_warm_worker, args=(app,), name="warmup", daemon=True).start()
+    yield
+    app.state.ready = False
+    if registry is not None:
+        registry.stop()
+    if updater is not None:
+        updater.stop()
+    shutdown_executor()
 
 class EmailInput(BaseModel):
     text: str
 
+class EmailBatchInput(BaseModel):
+    texts: List[str]
+    sugerir_resposta: bool = True
+
 class ChatInput(BaseModel):
     message: str
+    # Histórico completo enviado pelo cliente (modo legado, sem session_id)
     history: Optional[List] = []
+    session_id: Optional[str] = None
+    # Pede uma sessão no servidor sem ter session_id ainda (primeira mensagem).
+    # Com session_id expirado, o history enviado recria a sessão
+    use_session: bool = False
 
-@app.get("/")
+class FeedbackInput(BaseModel):
+    text: str
+    # Categoria correta informada pelo usuário: "Produtivo" ou "Improdutivo"
+    categoria: str
+    categoria_prevista: Optional[str] = None
+    modelo_versao: Optional[str] = None
+
+def _uses_session(data: ChatInput) -> bool:
+    # Clientes antigos enviam o histórico completo (ou nada) e recebem o history de volta
+    return data.session_id is not None or data.use_session
+
+SESSION_NOT_FOUND_DETAIL = "Sessão de chat não encontrada ou expirada. Reenvie o histórico para recriá-la."
+
+def _sse_response(events) -> StreamingResponse:
+    """Converte um gerador assíncrono de (evento, dados) em Server-Sent Events."""
+    async def stream():
+        try:
+            async for event, payload in events:
+                yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.error(f"Erro durante streaming: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)}, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/api")
 async def root():
     return {"message": "AutoU Email Classifier API", "version": "1.0.0"}
 
-@app.get("/health")
+@router.get("/health")
 async def health() -> Dict[str, str]:
     return {"status": "ok"}
 
-@app.post("/process_text")
-async def process_text(data: EmailInput):
+@router.get("/ready")
+async def ready(request: Request):
+    state = request.app.state
+    if not getattr(state, "ready", False):
+        return JSONResponse(status_code=503, content={"pronto": False})
+    return {"pronto": True, "componentes": state.components}
+
+@router.get("/model")
+async def model_info():
+    loaded = registry.current if registry is not None else None
+    if loaded is None:
+        return {"carregado": False, "versao": None}
+    info = {"carregado": True, "versao": loaded.version, "carregado_em": loaded.loaded_at}
+    if updater is not None:
+        info["atualizacao"] = await run_blocking(updater.status)
+    return info
+
+@router.post("/feedback", status_code=201)
+async def feedback(data: FeedbackInput):
+    """Registra uma correção de classificação; o modelo é atualizado em segundo plano."""
+    category = normalize_category(data.categoria)
+    if category is None:
+        raise HTTPException(status_code=400, detail="Categoria inválida. Use Produtivo ou Improdutivo")
+    if not data.text.strip():
+        raise HTTPException(status_code=400, detail="Texto vazio ou inválido.")
+    if feedback_store is None:
+        raise HTTPException(status_code=503, detail="Feedback indisponível")
+    
+    try:
+        record = await run_blocking(feedback_store.add, data.text, category,
+                                    data.categoria_prevista, data.modelo_versao)
+    except OSError as e:
+        logger.error(f"Erro ao registrar feedback: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao registrar feedback: {str(e)}")
+    FEEDBACK_RECEIVED.inc(categoria=category)
+    return {"status": "ok", "id": record["id"]}
+
+@router.get("/cache/stats")
+async def cache_stats():
+    if response_cache is None:
+        return {"disponivel": False}
+    stats = response_cache.stats()
+    stats["similaridade"] = similarity_index.stats()
+    return stats
+
+@router.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@router.post("/process_text")
+async def process_text(data: EmailInput, stream: bool = False):
+    if stream:
+        return _sse_response(classify_email_stream(data.text))
+    
     try:
-        result = classify_email(data.text)
+        result = await classify_email_async(data.text)
         return JSONResponse(content=result)
     except Exception as e:
         logger.error(f"Erro ao processar texto: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao processar texto: {str(e)}")
 
-@app.post("/upload_file")
+@router.post("/process_batch")
+async def process_batch(data: EmailBatchInput):
+    if len(data.texts) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Lote muito grande. Máximo de {BATCH_MAX_SIZE} emails por requisição")
+    
+    try:
+        results = await classify_emails_async(data.texts, with_response=data.sugerir_resposta)
+        return JSONResponse(content={"resultados": results})
+    except Exception as e:
+        logger.error(f"Erro ao processar lote: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar lote: {str(e)}")
+
+@router.post("/upload_file")
 async def upload_file(file: UploadFile = File(...)):
     filename = file.filename or ""
-    content = ""
-    
     if not filename.lower().endswith((".txt", ".pdf")):
         raise HTTPException(status_code=400, detail="Formato não suportado. Use .txt ou .pdf")
     
     try:
-        data = await file.read()
-        
-        if filename.lower().endswith(".txt"):
-            content = data.decode("utf-8", errors="ignore")
-        elif filename.lower().endswith(".pdf"):
-            pdf = fitz.open(stream=data, filetype="pdf")
-            for page in pdf:
-                content += page.get_text()
-            pdf.close()
+        # O upload é gravado em disco em blocos e o PDF é lido pelo caminho,
+        # com as páginas extraídas em paralelo no pool de processos
+        with timed("upload"):
+            path = await spool_upload(file, suffix=Path(filename).suffix)
+        try:
+            with timed("extracao"):
+                content = await extract_file(path, filename)
+        finally:
+            os.remove(path)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Erro ao ler arquivo: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Erro ao ler arquivo: {str(e)}")
     
     try:
-        result = classify_email(content)
+        result = await classify_email_async(content)
         return JSONResponse(content=result)
     except Exception as e:
         logger.error(f"Erro ao classificar email: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao classificar email: {str(e)}")
 
-@app.post("/chat")
+def _get_job(job_id: str) -> Dict:
+    if job_store is None or not job_store.available:
+        raise HTTPException(status_code=503, detail="Processamento de jobs indisponível")
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+@router.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...), sugerir_resposta: bool = False):
+    filename = file.filename or ""
+    if not is_mailbox_file(filename):
+        raise HTTPException(status_code=400, detail=f"Formato não suportado. Use {', '.join(MAILBOX_EXTENSIONS)}")
+    if job_store is None or not job_store.available:
+        raise HTTPException(status_code=503, detail="Processamento de jobs indisponível")
+    
+    try:
+        path = await spool_upload(file, suffix=Path(filename).suffix, max_bytes=JOB_UPLOAD_MAX_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao receber arquivo do job: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Erro ao ler arquivo: {str(e)}")
+    
+    try:
+        job = await run_blocking(submit_job, path, filename, sugerir_resposta)
+    except Exception as e:
+        os.remove(path)
+        logger.error(f"Erro ao criar job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao criar job: {str(e)}")
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return await run_blocking(_get_job, job_id)
+
+@router.get("/jobs/{job_id}/results")
+async def job_results(job_id: str, offset: int = 0, limit: int = 100, stream: bool = False):
+    """
+    Resultados do job. Com stream=true devolve NDJSON (um resultado por linha)
+    e acompanha o job até ele terminar; sem stream, uma página de resultados.
+    """
+    job = await run_blocking(_get_job, job_id)
+    if not stream:
+        limit = max(1, min(limit, 1000))
+        results = await run_blocking(lambda: list(job_store.iter_results(job_id, offset, limit)))
+        return {"job": job, "offset": offset, "resultados": results}
+    
+    async def ndjson():
+        next_index = offset
+        while True:
+            current = await run_blocking(job_store.get, job_id)
+            page = await run_blocking(lambda: list(job_store.iter_results(job_id, next_index, 500)))
+            for result in page:
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            if page:
+                next_index = page[-1]["indice"] + 1
+                continue
+            if current is None or current["status"] in FINAL_STATUSES:
+                return
+            await asyncio.sleep(JOB_STREAM_POLL_INTERVAL)
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    await run_blocking(_get_job, job_id)
+    # Um job em andamento para no próximo lote ao perceber que foi removido
+    await run_blocking(job_store.delete, job_id)
+    return {"status": "ok"}
+
+@router.post("/chat")
 async def chat(data: ChatInput):
     try:
-        result = chat_with_ai(data.message, data.history)
+        if _uses_session(data):
+            result = await chat_in_session_async(data.message, data.session_id, data.history)
+        else:
+            result = await chat_with_ai_async(data.message, data.history)
         return JSONResponse(content=result)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail=SESSION_NOT_FOUND_DETAIL)
     except Exception as e:
         logger.error(f"Erro no chat: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro no chat: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erro no chat: {str(e)}")
+
+@router.post("/chat/stream")
+async def chat_stream(data: ChatInput):
+    if _uses_session(data):
+        # A sessão é resolvida antes de abrir o stream para poder responder 404
+        try:
+            session = await run_blocking(open_session, data.session_id, data.history)
+        except SessionNotFound:
+            raise HTTPException(status_code=404, detail=SESSION_NOT_FOUND_DETAIL)
+        return _sse_response(chat_in_session_stream(data.message, session.id))
+    return _sse_response(chat_with_ai_stream(data.message, data.history))
+
+@router.delete("/chat/{session_id}")
+async def delete_chat_session(session_id: str):
+    if session_store is not None:
+        await run_blocking(session_store.delete, session_id)
+    return {"status": "ok"}
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="AutoU Email Classifier API", version="1.0.0", lifespan=lifespan)
+    app.state.ready = False
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Mais externo: mede também o tempo gasto nos demais middlewares
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router)
+    
+    # Montado por último para não encobrir as rotas da API; "/" é o index.html do
+    # frontend. Sem o build, "/" responde com a identificação da API (como /api)
+    if FRONTEND_DIST.exists():
+        app.mount("/", PrecompressedStaticFiles(directory=str(FRONTEND_DIST), html=True), name="frontend")
+    else:
+        logger.info("Frontend build não encontrado em %s — será necessário construir o frontend.", FRONTEND_DIST)
+        app.add_api_route("/", root, methods=["GET"])
+    
+    if PRELOAD_MODELS:
+        warmup()
+    return app
+
+app = create_app()
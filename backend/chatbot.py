@@ -1,96 +1,180 @@
-import os
+import asyncio
+import json
 import logging
-from typing import List, Dict
-import google.generativeai as genai
+from typing import AsyncIterator, Dict, List, Tuple
 
-from dotenv import load_dotenv
-load_dotenv()
+from utils.llm import CircuitOpenError, GeminiClient, call_llm, call_llm_sync, prompt_key, singleflight, stream_llm
+from utils.concurrency import run_blocking
+from utils.sessions import ChatSession, session_store
 
-# Configuração da API do Google
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        # Configuração do modelo para chat
-        generation_config = {
-            "temperature": 0.7,
-            "top_p": 0.95,
-            "top_k": 40,
-            "max_output_tokens": 1024,
-        }
-        
-        safety_settings = [
-            {
-                "category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_HATE_SPEECH",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-        ]
-        
-        chat_model = genai.GenerativeModel(
-            model_name="gemini-pro",
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
-        logging.info("Google AI Gemini configurado com sucesso para chat")
-    except Exception as e:
-        logging.error(f"Erro ao configurar Google AI para chat: {e}")
-        chat_model = None
-else:
-    chat_model = None
-    logging.warning("GOOGLE_API_KEY não encontrada. Chat não disponível.")
+
+# Cliente do Gemini, criado em cada worker no primeiro uso (ou no startup)
+gemini = GeminiClient("chat")
+
+UNAVAILABLE_RESPONSE = "Desculpe, o serviço de chat não está disponível no momento. Por favor, verifique a configuração da API."
+ERROR_RESPONSE = "Desculpe, ocorreu um erro ao processar sua mensagem. Por favor, tente novamente."
+
+def _to_gemini_history(history: List[Dict] = None) -> List[Dict]:
+    """Converte o histórico do frontend para o formato do Gemini."""
+    chat_history = []
+    if history:
+        for msg in history:
+            if msg.get("role") == "user":
+                chat_history.append({"role": "user", "parts": [msg.get("content", "")]})
+            elif msg.get("role") == "assistant":
+                chat_history.append({"role": "model", "parts": [msg.get("content", "")]})
+    return chat_history
+
+def _chat_key(message: str, gemini_history: List[Dict]) -> str:
+    # Mesma mensagem com o mesmo histórico produz a mesma chamada ao Gemini
+    return prompt_key("chat", json.dumps(gemini_history, ensure_ascii=False), message)
+
+def _chat_result(message: str, reply: str, history: List[Dict] = None) -> Dict:
+    # Atualiza o histórico
+    updated_history = (history or []) + [
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": reply}
+    ]
+    return {
+        "resposta": reply,
+        "history": updated_history
+    }
 
 def chat_with_ai(message: str, history: List[Dict] = None) -> Dict:
     """
     Função para interagir com o chatbot da Google AI.
     """
+    chat_model = gemini.get()
     if chat_model is None:
-        return {
-            "resposta": "Desculpe, o serviço de chat não está disponível no momento. Por favor, verifique a configuração da API.",
-            "history": history or []
-        }
+        return {"resposta": UNAVAILABLE_RESPONSE, "history": history or []}
     
     try:
-        # Prepara o histórico de conversa
-        chat_history = []
-        if history:
-            for msg in history:
-                if msg.get("role") == "user":
-                    chat_history.append({"role": "user", "parts": [msg.get("content", "")]})
-                elif msg.get("role") == "assistant":
-                    chat_history.append({"role": "model", "parts": [msg.get("content", "")]})
+        # Inicia a conversa e envia a mensagem atual
+        gemini_history = _to_gemini_history(history)
         
-        # Inicia a conversa
-        chat = chat_model.start_chat(history=chat_history)
+        def send() -> str:
+            chat = chat_model.start_chat(history=gemini_history)
+            return call_llm_sync(lambda: chat.send_message(message), purpose="chat").text
         
-        # Envia a mensagem atual
-        response = chat.send_message(message)
+        reply = singleflight.do_sync(_chat_key(message, gemini_history), send, purpose="chat")
+        return _chat_result(message, reply, history)
         
-        # Atualiza o histórico
-        updated_history = (history or []) + [
-            {"role": "user", "content": message},
-            {"role": "assistant", "content": response.text}
-        ]
-        
-        return {
-            "resposta": response.text,
-            "history": updated_history
-        }
+    except CircuitOpenError:
+        return {"resposta": UNAVAILABLE_RESPONSE, "history": history or []}
+    except Exception as e:
+        logging.error(f"Erro no chat: {e}")
+        return {"resposta": ERROR_RESPONSE, "history": history or []}
+
+async def _reply_async(chat_model, message: str, history: List[Dict] = None) -> str:
+    gemini_history = _to_gemini_history(history)
+    
+    async def send() -> str:
+        chat = chat_model.start_chat(history=gemini_history)
+        response = await call_llm(lambda: chat.send_message_async(message), purpose="chat")
+        return response.text
+    
+    return await singleflight.do(_chat_key(message, gemini_history), send, purpose="chat")
+
+async def chat_with_ai_async(message: str, history: List[Dict] = None) -> Dict:
+    """
+    Versão assíncrona de chat_with_ai, com limite de concorrência e timeout.
+    """
+    chat_model = gemini.get()
+    if chat_model is None:
+        return {"resposta": UNAVAILABLE_RESPONSE, "history": history or []}
+    
+    try:
+        reply = await _reply_async(chat_model, message, history)
+        return _chat_result(message, reply, history)
         
+    except CircuitOpenError:
+        return {"resposta": UNAVAILABLE_RESPONSE, "history": history or []}
+    except asyncio.TimeoutError:
+        return {"resposta": ERROR_RESPONSE, "history": history or []}
+    except Exception as e:
+        logging.error(f"Erro no chat: {e}")
+        return {"resposta": ERROR_RESPONSE, "history": history or []}
+
+async def chat_with_ai_stream(message: str, history: List[Dict] = None) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Versão em streaming do chat. Produz eventos ("token", {...}) à medida que o
+    Gemini responde e um evento final ("done", {"resposta", "history"}).
+    """
+    chat_model = gemini.get()
+    if chat_model is None:
+        yield "done", {"resposta": UNAVAILABLE_RESPONSE, "history": history or []}
+        return
+    
+    parts = []
+    try:
+        chat = chat_model.start_chat(history=_to_gemini_history(history))
+        async for part in stream_llm(lambda: chat.send_message_async(message, stream=True), purpose="chat"):
+            parts.append(part)
+            yield "token", {"texto": part}
+    except Exception as e:
+        if not isinstance(e, (asyncio.TimeoutError, CircuitOpenError)):
+            logging.error(f"Erro no chat: {e}")
+        if not parts:
+            reply = UNAVAILABLE_RESPONSE if isinstance(e, CircuitOpenError) else ERROR_RESPONSE
+            yield "done", {"resposta": reply, "history": history or []}
+            return
+    
+    yield "done", _chat_result(message, "".join(parts), history)
+
+class SessionNotFound(Exception):
+    """session_id desconhecido ou expirado e sem histórico para recriar a sessão."""
+
+def open_session(session_id: str = None, history: List[Dict] = None) -> ChatSession:
+    """
+    Sessão existente, ou uma nova quando não há session_id. Um session_id
+    desconhecido só vira sessão nova se o cliente reenviar o histórico; sem
+    ele, levanta SessionNotFound em vez de perder a conversa em silêncio.
+    """
+    if session_id:
+        session = session_store.get(session_id)
+        if session is not None:
+            return session
+        if not history:
+            raise SessionNotFound(session_id)
+        logging.info(f"Sessão {session_id} não encontrada; recriada a partir do histórico enviado")
+    return session_store.create(history)
+
+def _record_turn(session: ChatSession, message: str, reply: str):
+    session_store.append_turn(session, message, reply)
+
+async def chat_in_session_async(message: str, session_id: str = None, history: List[Dict] = None) -> Dict:
+    """
+    Chat com histórico mantido no servidor. O cliente envia apenas a mensagem e
+    o session_id; o histórico enviado ao Gemini é limitado pela janela da sessão.
+    """
+    session = await run_blocking(open_session, session_id, history)
+    chat_model = gemini.get()
+    if chat_model is None:
+        return {"resposta": UNAVAILABLE_RESPONSE, "session_id": session.id}
+    
+    try:
+        reply = await _reply_async(chat_model, message, session.to_history())
+    except CircuitOpenError:
+        return {"resposta": UNAVAILABLE_RESPONSE, "session_id": session.id}
+    except asyncio.TimeoutError:
+        return {"resposta": ERROR_RESPONSE, "session_id": session.id}
     except Exception as e:
         logging.error(f"Erro no chat: {e}")
-        return {
-            "resposta": "Desculpe, ocorreu um erro ao processar sua mensagem. Por favor, tente novamente.",
-            "history": history or []
-        }
\ No newline at end of file
+        return {"resposta": ERROR_RESPONSE, "session_id": session.id}
+    
+    await run_blocking(_record_turn, session, message, reply)
+    return {"resposta": reply, "session_id": session.id}
+
+async def chat_in_session_stream(message: str, session_id: str = None,
+                                 history: List[Dict] = None) -> AsyncIterator[Tuple[str, Dict]]:
+    """Versão em streaming de chat_in_session_async."""
+    session = await run_blocking(open_session, session_id, history)
+    history = session.to_history()
+    async for event, payload in chat_with_ai_stream(message, history):
+        if event != "done":
+            yield event, payload
+            continue
+        # Só registra a mensagem na sessão se o Gemini respondeu
+        if len(payload["history"]) > len(history):
+            await run_blocking(_record_turn, session, message, payload["resposta"])
+        yield "done", {"resposta": payload["resposta"], "session_id": session.id}
@@ -1,56 +1,158 @@
-import joblib
-from pathlib import Path
 import os
 import sys
+import asyncio
 import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 # Adiciona o diretório atual ao path para importações
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from utils.preprocessor import clean_text
-from utils.responses import suggest_response
+from utils.responses import default_response, suggest_response, suggest_response_async, suggest_response_stream
+from utils.concurrency import run_blocking
+from utils.keywords import KEYWORDS_THRESHOLD, keyword_matcher
+from utils.metrics import CLASSIFICATIONS, LLM_SKIPPED, timed
+from model_registry import MODEL_PATH, registry
 
 # Configura logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Tenta localizar model.joblib no diretório models/
-MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "model.joblib"
+EMPTY_TEXT_RESPONSE = "Texto vazio ou inválido."
 
-def classify_email(text: str):
-    if not text or not text.strip():
-        return {"categoria": "Improdutivo", "resposta": "Texto vazio ou inválido."}
-    
-    cleaned = clean_text(text)
-    
-    # Se existir modelo salvo, carrega o pipeline
-    if MODEL_PATH.exists():
+# Confiança mínima para responder emails Improdutivos com o template, sem chamar
+# o Gemini (valores acima de 1 desativam; o fallback por keywords nunca pula)
+RESPONSE_TEMPLATE_CONFIDENCE = float(os.getenv("RESPONSE_TEMPLATE_CONFIDENCE", "0.9"))
+
+def predict_categories(cleaned_texts: List[str]) -> Tuple[List[str], List[Optional[float]], Optional[str]]:
+    """
+    Classifica um lote de textos já limpos com uma única chamada ao pipeline.
+    Retorna (categorias, confianças, versão do modelo).
+    """
+    loaded = registry.get()
+    if loaded is not None and cleaned_texts:
         try:
-            pipeline = joblib.load(MODEL_PATH)
-            # pipeline espera texto cru (o vetorizer faz transform)
-            pred = pipeline.predict([cleaned])[0]
+            pipeline = loaded.pipeline
+            # Uma única transformação TF-IDF + produto matricial para todo o lote
+            if hasattr(pipeline, "predict_proba"):
+                proba = pipeline.predict_proba(cleaned_texts)
+                best = proba.argmax(axis=1)
+                preds = pipeline.classes_[best]
+                confidences = [float(p) for p in proba[range(len(best)), best]]
+            else:
+                preds = pipeline.predict(cleaned_texts)
+                confidences = [None] * len(cleaned_texts)
             # assumimos 1 = Produtivo, 0 = Improdutivo
-            category = "Produtivo" if int(pred) == 1 else "Improdutivo"
-            logger.info(f"Classificado usando modelo: {category}")
+            categories = ["Produtivo" if int(pred) == 1 else "Improdutivo" for pred in preds]
+            CLASSIFICATIONS.inc(len(categories), metodo="modelo")
+            return categories, confidences, loaded.version
         except Exception as e:
-            logger.error(f"Erro carregando/preditando com o modelo: {e}. Usando fallback por keywords.")
-            category = _fallback_by_keywords(cleaned)
-    else:
-        logger.warning("Modelo não encontrado. Usando fallback por keywords.")
-        category = _fallback_by_keywords(cleaned)
+            logger.error(f"Erro preditando com o modelo: {e}. Usando fallback por keywords.")
+    elif loaded is None:
+        logger.warning(f"Modelo não disponível em {MODEL_PATH}. Usando fallback por keywords.")
     
-    response = suggest_response(category, text)
-    return {"categoria": category, "resposta": response}
+    categories = [_fallback_by_keywords(cleaned) for cleaned in cleaned_texts]
+    CLASSIFICATIONS.inc(len(categories), metodo="keywords")
+    return categories, [None] * len(cleaned_texts), None
 
-def _fallback_by_keywords(text_cleaned: str) -> str:
-    keywords_produtivo = [
-        "suporte", "problema", "erro", "status", "atualizacao", "atualização",
-        "dúvida", "duvida", "reunião", "reuniao", "contrato", "anexo", "urgente",
-        "processo", "solicitação", "solicitacao", "chamado", "ajuda", "suporte", "cliente",
-        "projeto", "prazo", "entrega", "relatório", "relatorio", "documento", "pagamento",
-        "fatura", "nota fiscal", "orcamento", "orçamento", "proposta", "contrato"
-    ]
+def _classify_batch(texts: List[str]) -> List[Dict]:
+    """Etapa de CPU: limpeza e predição. A resposta sugerida é preenchida depois."""
+    results: List[Optional[Dict]] = [None] * len(texts)
+    indexes = []
+    cleaned_texts = []
+    
+    with timed("limpeza"):
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                results[i] = {"categoria": "Improdutivo", "resposta": EMPTY_TEXT_RESPONSE,
+                              "confianca": None, "modelo_versao": None}
+            else:
+                indexes.append(i)
+                cleaned_texts.append(clean_text(text))
+    
+    with timed("predicao"):
+        categories, confidences, model_version = predict_categories(cleaned_texts)
+    if model_version:
+        logger.info(f"Classificados {len(cleaned_texts)} emails usando modelo {model_version}")
+    
+    for i, category, confidence in zip(indexes, categories, confidences):
+        results[i] = {
+            "categoria": category,
+            "resposta": None,
+            "confianca": confidence,
+            "modelo_versao": model_version,
+        }
+    return results
+
+def _needs_response(result: Dict) -> bool:
+    return result["resposta"] is None
+
+def _apply_confidence_gate(results: List[Dict]):
+    """Responde com o template os Improdutivos de alta confiança; o resto segue para o Gemini."""
+    skipped = 0
+    for result in results:
+        confidence = result["confianca"]
+        if (_needs_response(result) and result["categoria"] == "Improdutivo"
+                and confidence is not None and confidence >= RESPONSE_TEMPLATE_CONFIDENCE):
+            result["resposta"] = default_response(result["categoria"])
+            skipped += 1
+    if skipped:
+        LLM_SKIPPED.inc(skipped, finalidade="respostas")
+
+def classify_emails(texts: List[str], with_response: bool = True) -> List[Dict]:
+    """Classifica vários emails de uma vez, preservando a ordem de entrada."""
+    results = _classify_batch(texts)
+    if with_response:
+        _apply_confidence_gate(results)
+        for text, result in zip(texts, results):
+            if _needs_response(result):
+                result["resposta"] = suggest_response(result["categoria"], text)
+    return results
+
+async def classify_emails_async(texts: List[str], with_response: bool = True) -> List[Dict]:
+    """
+    Versão assíncrona: a classificação roda no pool de CPU e as sugestões de
+    resposta são geradas concorrentemente, sem bloquear o event loop.
+    """
+    results = await run_blocking(_classify_batch, texts)
+    if with_response:
+        _apply_confidence_gate(results)
+        pending = [(text, result) for text, result in zip(texts, results) if _needs_response(result)]
+        responses = await asyncio.gather(
+            *(suggest_response_async(result["categoria"], text) for text, result in pending)
+        )
+        for (_, result), response in zip(pending, responses):
+            result["resposta"] = response
+    return results
+
+def classify_email(text: str):
+    return classify_emails([text])[0]
+
+async def classify_email_async(text: str):
+    return (await classify_emails_async([text]))[0]
+
+async def classify_email_stream(text: str) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Classifica o email e transmite a resposta sugerida em trechos. Produz
+    ("classificacao", {...}), depois ("token", {"texto"}) e por fim ("done", resultado).
+    """
+    result = (await run_blocking(_classify_batch, [text]))[0]
+    _apply_confidence_gate([result])
+    yield "classificacao", {k: v for k, v in result.items() if k != "resposta"}
     
-    if any(word in text_cleaned for word in keywords_produtivo):
+    if _needs_response(result):
+        parts = []
+        async for part in suggest_response_stream(result["categoria"], text):
+            parts.append(part)
+            yield "token", {"texto": part}
+        result["resposta"] = "".join(parts).strip()
+    else:
+        yield "token", {"texto": result["resposta"]}
+    yield "done", result
+
+def _fallback_by_keywords(text_cleaned: str) -> str:
+    match = keyword_matcher.match(text_cleaned)
+    if match.score >= KEYWORDS_THRESHOLD:
+        logger.info(f"Fallback por keywords: pontuação {match.score:.1f} ({', '.join(match.terms)})")
         return "Produtivo"
-    return "Improdutivo"
\ No newline at end of file
+    return "Improdutivo"
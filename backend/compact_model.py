@@ -0,0 +1,222 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+
+class CompactModel:
+    """
+    Inferência TF-IDF + regressão logística binária sem scikit-learn.
+    Lê o formato gerado por export_compact: vocabulário em texto, vetores
+    IDF e de coeficientes em .npy mapeados em memória (páginas compartilhadas
+    entre os workers) e a configuração do vetorizador em meta.json.
+    """
+
+    def __init__(self, directory: Path):
+        directory = Path(directory)
+        with open(directory / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(directory / "vocabulary.txt", "r", encoding="utf-8") as f:
+            self.vocabulary: Dict[str, int] = {line.rstrip("\n"): i for i, line in enumerate(f)}
+
+        self.idf = np.load(directory / "idf.npy", mmap_mode="r") if meta["use_idf"] else None
+        self.coef = np.load(directory / "coef.npy", mmap_mode="r")
+        self.intercept = float(meta["intercept"])
+        self.classes_ = np.asarray(meta["classes"])
+        self.version = meta["version"]
+
+        self._lowercase = meta["lowercase"]
+        self._token_pattern = re.compile(meta["token_pattern"])
+        self._stop_words = frozenset(meta["stop_words"] or ())
+        self._min_n, self._max_n = meta["ngram_range"]
+        self._sublinear_tf = meta["sublinear_tf"]
+        self._binary = meta["binary"]
+        self._norm = meta["norm"]
+
+    def _analyze(self, doc: str) -> List[str]:
+        # Mesmo analisador "word" do TfidfVectorizer
+        if self._lowercase:
+            doc = doc.lower()
+        tokens = [t for t in self._token_pattern.findall(doc) if t not in self._stop_words]
+        if self._max_n == 1:
+            return tokens
+        ngrams = list(tokens) if self._min_n == 1 else []
+        for n in range(max(self._min_n, 2), self._max_n + 1):
+            ngrams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return ngrams
+
+    def _features(self, doc: str):
+        """Retorna (índices, valores) do vetor TF-IDF normalizado de um documento."""
+        counts = Counter(self.vocabulary[t] for t in self._analyze(doc) if t in self.vocabulary)
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self._binary:
+            values[:] = 1.0
+        elif self._sublinear_tf:
+            values = np.log(values) + 1.0
+        if self.idf is not None:
+            values = values * self.idf[indices]
+        if self._norm == "l2":
+            norm = math.sqrt(float(values @ values))
+        elif self._norm == "l1":
+            norm = float(np.abs(values).sum())
+        else:
+            norm = 0.0
+        if norm > 0:
+            values = values / norm
+        return indices, values
+
+    def decision_function(self, texts: List[str]) -> np.ndarray:
+        # Um único produto matriz esparsa x coeficientes para o lote inteiro
+        return self.transform(texts) @ self.coef + self.intercept
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(texts)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        return self.classes_[(self.decision_function(texts) > 0).astype(int)]
+
+    def transform(self, texts: List[str]):
+        """Matriz TF-IDF esparsa (scipy), usada na decisão e pelo índice de similaridade."""
+        from scipy.sparse import csr_matrix
+
+        rows = [self._features(text) for text in texts]
+        indptr = np.cumsum([0] + [len(indices) for indices, _ in rows])
+        indices = np.concatenate([r[0] for r in rows]) if rows else np.empty(0, dtype=np.int64)
+        data = np.concatenate([r[1] for r in rows]) if rows else np.empty(0)
+        return csr_matrix((data, indices, indptr), shape=(len(texts), len(self.vocabulary)))
+
+
+def _check_supported(tfidf, clf):
+    if tfidf.analyzer != "word" or tfidf.tokenizer is not None or tfidf.preprocessor is not None:
+        raise ValueError("Formato compacto suporta apenas o analisador 'word' padrão")
+    if tfidf.strip_accents is not None:
+        raise ValueError("Formato compacto não suporta strip_accents")
+    if len(clf.classes_) != 2 or clf.coef_.shape[0] != 1:
+        raise ValueError("Formato compacto suporta apenas classificação binária")
+
+
+def _write_version(target: Path, meta: Dict, terms: List[str], idf: np.ndarray, coef: np.ndarray):
+    """Grava a versão num diretório temporário vizinho e o renomeia para target."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp"))
+    try:
+        with open(tmp / "vocabulary.txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(terms) + "\n")
+        np.save(tmp / "idf.npy", idf)
+        np.save(tmp / "coef.npy", coef)
+        # meta.json por último: marca a versão como completa
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        if target.exists() and not (target / "meta.json").exists():
+            # Sobra de uma exportação interrompida: sem meta.json nunca foi carregada
+            shutil.rmtree(target)
+        try:
+            os.replace(tmp, target)
+        except OSError:
+            # Outro processo exportou a mesma versão primeiro
+            if not (target / "meta.json").exists():
+                raise
+    finally:
+        if tmp.exists():
+            shutil.rmtree(tmp)
+
+
+def publish_compact(out_dir, version: str):
+    """Aponta out_dir/current.json para a versão (troca atômica: o backend observa o arquivo)."""
+    out_dir = Path(out_dir)
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=".current.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"version": version}, f)
+    os.replace(tmp_path, out_dir / "current.json")
+
+
+def export_compact(pipeline, out_dir, publish: bool = True) -> Path:
+    """
+    Grava o pipeline TF-IDF + LogisticRegression (etapas "tfidf" e "clf") em
+    out_dir/<versão>/ e, com publish, atualiza out_dir/current.json.
+    """
+    tfidf = pipeline.named_steps["tfidf"]
+    clf = pipeline.named_steps["clf"]
+    _check_supported(tfidf, clf)
+
+    out_dir = Path(out_dir)
+    terms = [None] * len(tfidf.vocabulary_)
+    for term, index in tfidf.vocabulary_.items():
+        terms[index] = term
+    idf = np.asarray(tfidf.idf_, dtype=np.float64) if tfidf.use_idf else np.empty(0)
+    coef = np.ascontiguousarray(clf.coef_[0], dtype=np.float64)
+    stop_words = tfidf.get_stop_words()
+
+    meta = {
+        "lowercase": tfidf.lowercase,
+        "token_pattern": tfidf.token_pattern,
+        "stop_words": sorted(stop_words) if stop_words else None,
+        "ngram_range": list(tfidf.ngram_range),
+        "sublinear_tf": tfidf.sublinear_tf,
+        "binary": tfidf.binary,
+        "norm": tfidf.norm,
+        "use_idf": tfidf.use_idf,
+        "intercept": float(clf.intercept_[0]),
+        "classes": [int(c) for c in clf.classes_],
+    }
+    digest = hashlib.sha256()
+    digest.update(json.dumps(meta, sort_keys=True).encode("utf-8"))
+    digest.update("\n".join(terms).encode("utf-8"))
+    digest.update(idf.tobytes())
+    digest.update(coef.tobytes())
+    version = digest.hexdigest()[:12]
+    meta["version"] = version
+
+    target = out_dir / version
+    # A versão é o hash do conteúdo: se já existe, os arquivos são idênticos. Nunca
+    # regrava .npy de uma versão existente: os workers os mapeiam em memória e
+    # truncar um arquivo mapeado derruba o leitor com SIGBUS
+    if (target / "meta.json").exists():
+        logging.info(f"Modelo compacto {version} já exportado em {target}")
+    else:
+        _write_version(target, meta, terms, idf, coef)
+
+    if publish:
+        publish_compact(out_dir, version)
+    logging.info(f"Modelo compacto {version} exportado em {target}")
+    return target
+
+
+def clear_compact(out_dir) -> bool:
+    """
+    Remove current.json para que o backend (MODEL_FORMAT=auto) volte a servir o
+    joblib. Usado quando o modelo salvo não pode ser exportado no formato compacto.
+    """
+    pointer = Path(out_dir) / "current.json"
+    try:
+        os.remove(pointer)
+    except FileNotFoundError:
+        return False
+    logging.info(f"Ponteiro do modelo compacto removido ({pointer}); o backend usará o joblib")
+    return True
+
+
+def verify_compact(pipeline, directory, texts, tolerance=1e-9) -> float:
+    """Compara predict_proba do modelo compacto com o pipeline. Levanta erro se divergir."""
+    texts = list(texts)
+    compact = CompactModel(directory)
+    expected = pipeline.predict_proba(texts)
+    actual = compact.predict_proba(texts)
+    diff = float(np.abs(expected - actual).max()) if texts else 0.0
+    if diff > tolerance or list(compact.predict(texts)) != list(pipeline.predict(texts)):
+        raise AssertionError(f"Modelo compacto diverge do pipeline (diferença máxima {diff:.3e})")
+    logging.info(f"Paridade do modelo compacto conferida em {len(texts)} textos (diferença máxima {diff:.3e})")
+    return diff
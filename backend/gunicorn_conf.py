@@ -0,0 +1,17 @@
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Importa o app (e carrega o modelo) uma única vez no master antes do fork:
+# os workers compartilham essas páginas de memória via copy-on-write
+preload_app = True
+os.environ.setdefault("PRELOAD_MODELS", "1")
+
+
+def when_ready(server):
+    # Move os objetos já carregados para a geração permanente do GC, evitando
+    # que as coletas nos workers toquem (e copiem) as páginas compartilhadas
+    gc.freeze()
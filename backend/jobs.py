@@ -0,0 +1,76 @@
+import logging
+import os
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
+
+from classifier import classify_emails
+from utils.concurrency import get_job_executor
+from utils.job_store import DONE, FAILED, RUNNING, job_store
+from utils.mail_archive import iter_messages
+
+logger = logging.getLogger(__name__)
+
+# Mensagens classificadas por lote (uma chamada ao modelo e uma transação no banco)
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "64"))
+
+# Campos da mensagem copiados para o resultado (o texto completo não é guardado)
+_MESSAGE_FIELDS = ("origem", "message_id", "assunto", "remetente", "data")
+
+
+def _batches(messages: Iterator[Dict], size: int) -> Iterator[List[Tuple[int, Dict]]]:
+    numbered = enumerate(messages)
+    while True:
+        batch = list(islice(numbered, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _classify_batch(batch: List[Tuple[int, Dict]], with_response: bool) -> Tuple[List[Tuple[int, Dict]], int]:
+    valid = [(index, message) for index, message in batch if "erro" not in message]
+    classified = classify_emails([message["texto"] for _, message in valid], with_response=with_response)
+    by_index = {index: result for (index, _), result in zip(valid, classified)}
+
+    results = []
+    errors = 0
+    for index, message in batch:
+        record = {"indice": index}
+        record.update((field, message.get(field)) for field in _MESSAGE_FIELDS)
+        if index in by_index:
+            record.update(by_index[index])
+        else:
+            record["erro"] = message["erro"]
+            errors += 1
+        results.append((index, record))
+    return results, errors
+
+
+def run_job(job_id: str, path: str, filename: str, with_response: bool):
+    """
+    Processa o arquivo do job em lotes: as mensagens são lidas uma a uma do
+    disco e cada lote é classificado e gravado antes do próximo ser lido, então
+    a memória usada não depende do tamanho da exportação.
+    """
+    job_store.set_status(job_id, RUNNING)
+    total = 0
+    try:
+        for batch in _batches(iter_messages(path, filename), JOB_BATCH_SIZE):
+            results, errors = _classify_batch(batch, with_response)
+            if not job_store.add_results(job_id, results, errors):
+                logger.info(f"Job {job_id} removido durante o processamento; interrompendo")
+                return
+            total += len(batch)
+        job_store.set_status(job_id, DONE, total=total)
+        logger.info(f"Job {job_id} concluído: {total} mensagens de {filename}")
+    except Exception as e:
+        logger.error(f"Erro no job {job_id}: {e}")
+        job_store.set_status(job_id, FAILED, f"Erro ao processar arquivo: {e}", total=total)
+    finally:
+        os.remove(path)
+
+
+def submit_job(path: str, filename: str, with_response: bool = False) -> Dict:
+    """Registra o job e o coloca no pool de jobs; o arquivo em `path` passa a pertencer ao job."""
+    job = job_store.create(filename, with_response)
+    get_job_executor().submit(run_job, job["id"], path, filename, with_response)
+    return job
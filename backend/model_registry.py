@@ -0,0 +1,152 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from utils.metrics import MODEL_LOADS, Callback
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "model.joblib"
+# Arquivo que aponta para a versão atual do modelo compacto (training/export.py)
+COMPACT_POINTER = MODEL_PATH.parent / "compact" / "current.json"
+
+# Intervalo (segundos) entre verificações de mudança no arquivo do modelo
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+# Formato do modelo: "auto" (compacto se exportado, senão joblib), "compact" ou "joblib"
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "auto").lower()
+
+
+class LoadedModel:
+    """Pipeline já carregado, com a versão (hash do arquivo) que o identifica."""
+
+    __slots__ = ("pipeline", "version", "loaded_at")
+
+    def __init__(self, pipeline: Any, version: str):
+        self.pipeline = pipeline
+        self.version = version
+        self.loaded_at = time.time()
+
+
+def _load_joblib(path: Path):
+    # joblib/scikit-learn só são importados quando o formato pickle é usado
+    import joblib
+
+    data = path.read_bytes()
+    version = hashlib.sha256(data).hexdigest()[:12]
+    return version, lambda: joblib.load(io.BytesIO(data))
+
+
+def _load_compact(pointer: Path):
+    # numpy só é importado quando o modelo é carregado, não na importação do app
+    from compact_model import CompactModel
+
+    with open(pointer, "r", encoding="utf-8") as f:
+        version = json.load(f)["version"]
+    return version, lambda: CompactModel(pointer.parent / version)
+
+
+class ModelRegistry:
+    """
+    Mantém o modelo carregado em memória e o troca atomicamente quando o
+    arquivo em disco muda. Requisições sempre leem uma referência completa:
+    o novo pipeline só é publicado depois de totalmente carregado.
+    """
+
+    def __init__(self, path: Path = MODEL_PATH, compact_pointer: Path = COMPACT_POINTER,
+                 model_format: str = MODEL_FORMAT, interval: float = MODEL_RELOAD_INTERVAL):
+        self.path = Path(path)
+        self.compact_pointer = Path(compact_pointer)
+        self.model_format = model_format
+        self.interval = interval
+        self._current: Optional[LoadedModel] = None
+        self._signature = None
+        self._attempted = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def current(self) -> Optional[LoadedModel]:
+        return self._current
+
+    def get(self) -> Optional[LoadedModel]:
+        """Retorna o modelo atual, carregando-o na primeira chamada."""
+        if self._current is None and not self._attempted:
+            self.load()
+        return self._current
+
+    def _source(self):
+        """Arquivo observado e função de carga, conforme o formato configurado."""
+        if self.model_format == "compact" or (self.model_format == "auto" and self.compact_pointer.exists()):
+            return self.compact_pointer, _load_compact
+        return self.path, _load_joblib
+
+    def load(self) -> bool:
+        """Carrega o modelo do disco. Retorna True se uma nova versão foi publicada."""
+        with self._lock:
+            self._attempted = True
+            path, loader = self._source()
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                if self._current is None:
+                    logger.warning("Modelo não encontrado em %s", path)
+                return False
+
+            signature = (str(path), st.st_mtime_ns, st.st_size)
+            if signature == self._signature and self._current is not None:
+                return False
+
+            try:
+                version, build = loader(path)
+                if self._current is not None and self._current.version == version:
+                    self._signature = signature
+                    return False
+                pipeline = build()
+            except Exception as e:
+                # Mantém a versão anterior em caso de arquivo corrompido/incompleto
+                MODEL_LOADS.inc(resultado="erro")
+                logger.error(f"Erro ao carregar modelo de {path}: {e}")
+                return False
+
+            self._current = LoadedModel(pipeline, version)
+            self._signature = signature
+            MODEL_LOADS.inc(resultado="sucesso")
+            logger.info(f"Modelo carregado de {path.name}: versão {version}")
+            return True
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.load()
+
+    def start(self):
+        """Inicia a verificação periódica do arquivo do modelo em segundo plano."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+
+registry = ModelRegistry()
+
+
+def _model_info():
+    loaded = registry.current
+    if loaded is not None:
+        yield (loaded.version,), loaded.loaded_at
+
+Callback("autou_modelo_carregado_em", "Momento (epoch) em que a versão atual do modelo foi carregada", "gauge",
+         ["versao"], _model_info)
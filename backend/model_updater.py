@@ -0,0 +1,339 @@
+"""
+Atualização incremental do modelo a partir das correções enviadas em /feedback.
+
+Periodicamente, quando há correções novas suficientes, uma cópia do modelo em
+disco é atualizada num processo próprio (fora do event loop e do GIL dos
+workers): classificadores com partial_fit (ex.: SGD do training/train_stream.py)
+aprendem só com as correções novas; os demais (LogisticRegression) têm a camada
+final reajustada com as features fixas, partindo dos pesos atuais. Nesse
+reajuste o vocabulário do TF-IDF fica congelado: palavras que só aparecem nas
+correções não viram features até um novo training/retrain.py.
+
+A cópia só é promovida se melhorar a acurácia no conjunto de validação
+(correções reservadas por FEEDBACK_HOLDOUT_PERCENT, com pelo menos
+FEEDBACK_MIN_HOLDOUT exemplos). A promoção grava a versão
+em models/versions/<versão>.joblib e troca models/model.joblib por rename
+atômico; se o modelo compacto estiver em uso, ele é reexportado e conferido
+para a nova versão (ou, em MODEL_FORMAT=auto, o ponteiro é removido se a
+exportação falhar). O ModelRegistry de cada worker passa a servir a nova
+versão. Um lock
+de arquivo garante que só um processo atualize o modelo por vez.
+"""
+import fcntl
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from model_registry import COMPACT_POINTER, MODEL_FORMAT, MODEL_PATH, registry
+from utils.concurrency import get_update_executor
+from utils.feedback import FEEDBACK_PATH, feedback_store, is_holdout, normalize_category
+from utils.metrics import MODEL_UPDATES
+from utils.preprocessor import clean_text
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = MODEL_PATH.parent / "versions"
+
+# Intervalo (segundos) entre verificações de correções novas (0 desativa a atualização)
+FEEDBACK_UPDATE_INTERVAL = float(os.getenv("FEEDBACK_UPDATE_INTERVAL", "300"))
+# Número mínimo de correções novas para iniciar uma atualização
+FEEDBACK_MIN_BATCH = int(os.getenv("FEEDBACK_MIN_BATCH", "10"))
+# Queda máxima de acurácia na validação aceita para promover o modelo atualizado
+# (com 0, o padrão, a cópia precisa ser estritamente melhor; empates não promovem)
+FEEDBACK_MAX_REGRESSION = float(os.getenv("FEEDBACK_MAX_REGRESSION", "0"))
+# Número mínimo de correções de validação para comparar os modelos
+FEEDBACK_MIN_HOLDOUT = int(os.getenv("FEEDBACK_MIN_HOLDOUT", "10"))
+# Número de versões promovidas mantidas em models/versions (para rollback)
+FEEDBACK_KEEP_VERSIONS = int(os.getenv("FEEDBACK_KEEP_VERSIONS", "5"))
+# Dataset original somado às correções no reajuste da camada final (evita esquecer a base)
+FEEDBACK_BASE_DATASET = os.getenv(
+    "FEEDBACK_BASE_DATASET", str(Path(__file__).resolve().parent.parent / "sample_emails" / "dataset.json")
+)
+
+Example = Tuple[str, int]
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Grava em arquivo temporário no mesmo diretório e renomeia para o destino."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def _update_lock(path: Path):
+    """Lock exclusivo não bloqueante: devolve False se outro processo já está atualizando."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_state(versions_dir: Path = VERSIONS_DIR) -> Dict:
+    """Até onde o arquivo de feedback já foi usado e a última versão promovida."""
+    try:
+        with open(versions_dir / "state.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"offset": 0}
+
+
+def _write_state(versions_dir: Path, state: Dict):
+    _write_atomic(versions_dir / "state.json", json.dumps(state, ensure_ascii=False).encode("utf-8"))
+
+
+def _example(record: Dict) -> Optional[Example]:
+    category = normalize_category(record.get("categoria") or record.get("label"))
+    text = (record.get("texto") or record.get("text") or "").strip()
+    if not text or category is None:
+        return None
+    # Mesmo pré-processamento aplicado antes da predição
+    return clean_text(text), 1 if category == "Produtivo" else 0
+
+
+def _load_base_dataset(path: str) -> List[Example]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+    return [example for example in map(_example, data) if example is not None]
+
+
+def _accuracy(pipeline, examples: List[Example]) -> float:
+    predicted = pipeline.predict([text for text, _ in examples])
+    return sum(int(p) == label for p, (_, label) in zip(predicted, examples)) / len(examples)
+
+
+def _prune_versions(versions_dir: Path, keep: int, current: str):
+    files = sorted(versions_dir.glob("*.joblib"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in files[keep:]:
+        if path.stem != current:
+            path.unlink(missing_ok=True)
+
+
+def _refresh_compact(pipeline, compact_dir: Path, texts: List[str]) -> str:
+    """
+    Reexporta o modelo compacto servido para o pipeline promovido e confere a
+    paridade antes de trocar o ponteiro. Devolve a versão exportada ou o que
+    foi feito ("nao_usado", "removido", "erro").
+    """
+    from compact_model import clear_compact, export_compact, publish_compact, verify_compact
+
+    if MODEL_FORMAT == "joblib" or (MODEL_FORMAT == "auto" and not (compact_dir / "current.json").exists()):
+        return "nao_usado"
+    try:
+        target = export_compact(pipeline, compact_dir, publish=False)
+        verify_compact(pipeline, target, texts)
+    except Exception as e:
+        logger.warning(f"Não foi possível reexportar o modelo compacto: {e}")
+        # Em modo auto, sem o ponteiro o registry passa a servir o joblib atualizado
+        if MODEL_FORMAT == "auto" and clear_compact(compact_dir):
+            return "removido"
+        return "erro"
+    publish_compact(compact_dir, target.name)
+    return target.name
+
+
+def update_model(model_path: str = str(MODEL_PATH), feedback_path: str = FEEDBACK_PATH,
+                 versions_dir: str = str(VERSIONS_DIR), base_dataset: str = FEEDBACK_BASE_DATASET,
+                 max_regression: float = FEEDBACK_MAX_REGRESSION, keep_versions: int = FEEDBACK_KEEP_VERSIONS,
+                 min_holdout: int = FEEDBACK_MIN_HOLDOUT, compact_dir: str = str(COMPACT_POINTER.parent)) -> Dict:
+    """
+    Atualiza uma cópia do modelo com as correções e a promove se passar na
+    validação. Roda no pool de atualização; devolve um resumo com o "resultado".
+    O reajuste da camada final não refaz o vocabulário do vetorizador.
+    """
+    # Dependências pesadas só no processo que treina
+    import joblib
+
+    from utils.feedback import FeedbackStore
+
+    model_path, versions_dir = Path(model_path), Path(versions_dir)
+    with _update_lock(versions_dir / ".update.lock") as acquired:
+        if not acquired:
+            return {"resultado": "ocupado"}
+
+        state = read_state(versions_dir)
+        offset = state.get("offset", 0)
+        train, new_train, holdout = [], [], []
+        end = offset
+        for position, record in FeedbackStore(feedback_path).read():
+            example = _example(record)
+            end = position
+            if example is None:
+                continue
+            if is_holdout(record.get("id", "0")):
+                holdout.append(example)
+            else:
+                train.append(example)
+                if position > offset:
+                    new_train.append(example)
+
+        summary = {"novos": len(new_train), "validacao": len(holdout)}
+        if not new_train:
+            # Só chegaram correções de validação: marca como vistas para não reprocessar
+            if end > offset:
+                _write_state(versions_dir, {**state, "offset": end})
+            return {**summary, "resultado": "sem_dados"}
+        if len(holdout) < max(1, min_holdout):
+            # Com poucas correções de validação a comparação não é confiável: espera mais
+            return {**summary, "resultado": "aguardando_validacao"}
+
+        try:
+            st = model_path.stat()
+            data = model_path.read_bytes()
+        except FileNotFoundError:
+            return {**summary, "resultado": "erro", "erro": f"Modelo não encontrado em {model_path}"}
+        current_version = hashlib.sha256(data).hexdigest()[:12]
+        current = joblib.load(io.BytesIO(data))
+        candidate = joblib.load(io.BytesIO(data))
+
+        features, head = candidate[:-1], candidate.steps[-1][1]
+        if hasattr(head, "partial_fit"):
+            method = "partial_fit"
+            texts, labels = zip(*new_train)
+            head.partial_fit(features.transform(list(texts)), list(labels))
+        else:
+            # Features fixas: reajusta só a camada final com a base + todas as correções
+            method = "reajuste_cabeca"
+            examples = _load_base_dataset(base_dataset) + train
+            texts, labels = zip(*examples)
+            if len(set(labels)) < 2:
+                return {**summary, "resultado": "aguardando_validacao", "metodo": method}
+            if "warm_start" in head.get_params():
+                head.set_params(warm_start=True)
+            head.fit(features.transform(list(texts)), list(labels))
+
+        current_accuracy = _accuracy(current, holdout)
+        candidate_accuracy = _accuracy(candidate, holdout)
+        summary.update({
+            "metodo": method,
+            "versao_anterior": current_version,
+            "acuracia_anterior": current_accuracy,
+            "acuracia_nova": candidate_accuracy,
+        })
+        state["offset"] = end
+
+        if max_regression > 0:
+            accepted = candidate_accuracy >= current_accuracy - max_regression
+        else:
+            accepted = candidate_accuracy > current_accuracy
+        if not accepted:
+            _write_state(versions_dir, state)
+            return {**summary, "resultado": "rejeitado"}
+
+        buffer = io.BytesIO()
+        joblib.dump(candidate, buffer)
+        new_data = buffer.getvalue()
+        version = hashlib.sha256(new_data).hexdigest()[:12]
+
+        # O modelo pode ter sido substituído (ex.: retrain.py) enquanto a cópia treinava
+        latest = model_path.stat()
+        if (latest.st_mtime_ns, latest.st_size) != (st.st_mtime_ns, st.st_size):
+            return {**summary, "resultado": "modelo_alterado"}
+
+        _write_atomic(versions_dir / f"{version}.joblib", new_data)
+        _write_atomic(model_path, new_data)
+        compact = _refresh_compact(candidate, Path(compact_dir), [text for text, _ in holdout + train])
+        summary.update({"versao": version, "compacto": compact, "promovido_em": time.time()})
+        with open(versions_dir / "history.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        state["versao"] = version
+        _write_state(versions_dir, state)
+        _prune_versions(versions_dir, keep_versions, version)
+        return {**summary, "resultado": "promovido"}
+
+
+class FeedbackUpdater:
+    """
+    Verifica em segundo plano se há correções novas e dispara update_model no
+    processo de atualização (separado do pool de PDFs). As requisições nunca esperam pela atualização: o modelo
+    promovido chega aos workers pelo ModelRegistry.
+    """
+
+    def __init__(self, interval: float = FEEDBACK_UPDATE_INTERVAL, min_batch: int = FEEDBACK_MIN_BATCH):
+        self.interval = interval
+        self.min_batch = min_batch
+        self.last: Optional[Dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def pending(self) -> int:
+        """Correções acrescentadas depois da última atualização."""
+        offset = read_state().get("offset", 0)
+        if feedback_store.size() <= offset:
+            return 0
+        return sum(1 for _ in feedback_store.read(offset))
+
+    def run_once(self) -> Optional[Dict]:
+        if self.pending() < self.min_batch:
+            return None
+        try:
+            result = get_update_executor().submit(update_model).result()
+        except Exception as e:
+            result = {"resultado": "erro", "erro": str(e)}
+        MODEL_UPDATES.inc(resultado=result["resultado"])
+        if result["resultado"] == "promovido":
+            logger.info(f"Modelo atualizado com feedback: versão {result['versao']} "
+                        f"(acurácia de validação {result['acuracia_anterior']:.4f} -> {result['acuracia_nova']:.4f})")
+            if result.get("compacto") == "erro":
+                logger.warning("O modelo compacto em uso não foi atualizado; reexporte com training/export.py")
+            registry.load()
+        elif result["resultado"] == "erro":
+            logger.error(f"Erro ao atualizar o modelo com feedback: {result.get('erro')}")
+        else:
+            logger.info(f"Atualização com feedback não promovida: {result}")
+        self.last = result
+        return result
+
+    def status(self) -> Dict:
+        return {"ativo": self._thread is not None and self._thread.is_alive(),
+                "pendentes": self.pending(), "ultima": self.last}
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Erro na verificação de feedback: {e}")
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="feedback-updater", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+updater = FeedbackUpdater()
@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from utils.preprocessor import clean_text
+from utils.storage import ProcessLocalSQLite
+
+# Número máximo de respostas mantidas em cache
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+# Tempo de vida (segundos) de cada resposta em cache
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+# Caminho opcional de um banco SQLite compartilhado entre workers/reinícios
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")
+
+
+def cache_key(category: str, text: str) -> str:
+    """Chave do cache: hash da categoria com o texto normalizado."""
+    normalized = clean_text(text)
+    return hashlib.sha256(f"{category}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class _MemoryBackend:
+    """LRU em memória com expiração por TTL."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str, now: float) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= now:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, expires_at: float):
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _SQLiteBackend:
+    """Cache em disco (SQLite em modo WAL), compartilhado entre processos."""
+
+    def __init__(self, path: str, max_size: int):
+        self.max_size = max_size
+        self._db = ProcessLocalSQLite(path, [
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache(last_access)",
+        ])
+
+    def get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        """Valor e expiração da entrada, ou None se ausente/expirada."""
+        row = self._db.execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= now:
+            self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            return None
+        self._db.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+        return value, expires_at
+
+    def set(self, key: str, value: str, expires_at: float, now: float):
+        self._db.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, expires_at, now),
+        )
+        # Remove as entradas menos usadas recentemente além do limite
+        self._db.execute(
+            "DELETE FROM response_cache WHERE key IN ("
+            "SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,),
+        )
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Cache de respostas sugeridas com LRU + TTL em memória e, opcionalmente,
+    um segundo nível em SQLite que sobrevive a reinícios.
+    """
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 path: Optional[str] = RESPONSE_CACHE_PATH):
+        self.ttl = ttl
+        self._memory = _MemoryBackend(max_size)
+        self._disk = None
+        if path:
+            try:
+                self._disk = _SQLiteBackend(path, max_size)
+                logging.info(f"Cache de respostas persistido em {path}")
+            except sqlite3.Error as e:
+                logging.error(f"Erro ao abrir cache SQLite em {path}: {e}. Usando apenas memória.")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, category: str, text: str) -> Optional[str]:
+        key = cache_key(category, text)
+        now = time.time()
+        with self._lock:
+            value = self._memory.get(key, now)
+            if value is None and self._disk is not None:
+                stored = None
+                try:
+                    stored = self._disk.get(key, now)
+                except sqlite3.Error as e:
+                    logging.error(f"Erro lendo cache SQLite: {e}")
+                if stored is not None:
+                    # Mantém a expiração gravada no disco: a promoção não renova o TTL
+                    value, expires_at = stored
+                    self._memory.set(key, value, expires_at)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, category: str, text: str, value: str):
+        key = cache_key(category, text)
+        now = time.time()
+        with self._lock:
+            self._memory.set(key, value, now + self.ttl)
+            if self._disk is not None:
+                try:
+                    self._disk.set(key, value, now + self.ttl, now)
+                except sqlite3.Error as e:
+                    logging.error(f"Erro gravando cache SQLite: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entradas_memoria": len(self._memory),
+                "persistente": self._disk is not None,
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,103 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Número de threads para etapas de CPU (classificação, leitura de PDF)
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Número de processos para extração paralela de páginas de PDF
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Como os processos do pool são criados: "forkserver" (padrão) ou "spawn". Não usa
+# fork: o worker tem várias threads (watcher do modelo, pools, clientes gRPC) e um
+# fork herdaria locks que outra thread estivesse segurando
+PROCESS_START_METHOD = os.getenv("PROCESS_START_METHOD", "forkserver")
+# Número de jobs de ingestão (mbox/.eml/.zip) processados ao mesmo tempo por worker
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_process_executor: Optional[ProcessPoolExecutor] = None
+_job_executor: Optional[ThreadPoolExecutor] = None
+_update_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+        logging.info(f"Pool de CPU iniciado com {CPU_WORKERS} threads")
+    return _executor
+
+
+def process_context():
+    """Contexto de multiprocessing sem fork do processo (multi-thread) atual."""
+    method = PROCESS_START_METHOD
+    if method not in multiprocessing.get_all_start_methods():
+        method = "spawn"
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        # O servidor importa o extrator uma vez; cada processo filho já nasce com ele
+        context.set_forkserver_preload(["utils.extractor"])
+    return context
+
+
+def get_process_executor() -> ProcessPoolExecutor:
+    global _process_executor
+    if _process_executor is None:
+        _process_executor = ProcessPoolExecutor(max_workers=PROCESS_WORKERS, mp_context=process_context())
+        logging.info(f"Pool de processos iniciado com {PROCESS_WORKERS} processos ({PROCESS_START_METHOD})")
+    return _process_executor
+
+
+def get_job_executor() -> ThreadPoolExecutor:
+    # Separado do pool de CPU para que jobs longos não atrasem as requisições
+    global _job_executor
+    if _job_executor is None:
+        _job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        logging.info(f"Pool de jobs iniciado com {JOB_WORKERS} threads")
+    return _job_executor
+
+
+def get_update_executor() -> ProcessPoolExecutor:
+    # Processo próprio para a atualização do modelo: um retreino longo não ocupa
+    # o pool de extração de PDF usado pelas requisições
+    global _update_executor
+    if _update_executor is None:
+        _update_executor = ProcessPoolExecutor(max_workers=1, mp_context=process_context())
+        logging.info(f"Pool de atualização do modelo iniciado ({PROCESS_START_METHOD})")
+    return _update_executor
+
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """Executa uma função síncrona no pool limitado, sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    # Propaga o contexto da requisição (ex.: medição das etapas) para a thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+async def run_in_process(func: Callable[..., T], *args) -> T:
+    """Executa uma função (de nível de módulo, serializável) no pool de processos."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_executor(), func, *args)
+
+
+def shutdown():
+    global _executor, _process_executor, _job_executor, _update_executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _process_executor is not None:
+        _process_executor.shutdown(wait=False, cancel_futures=True)
+        _process_executor = None
+    if _job_executor is not None:
+        _job_executor.shutdown(wait=False, cancel_futures=True)
+        _job_executor = None
+    if _update_executor is not None:
+        _update_executor.shutdown(wait=False, cancel_futures=True)
+        _update_executor = None
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import tempfile
+from typing import List
+
+from utils.concurrency import run_blocking, run_in_process
+
+# Tamanho máximo de arquivo aceito no upload (bytes)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+# Número máximo de páginas de PDF lidas
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "200"))
+# Número máximo de caracteres extraídos de um arquivo
+EXTRACT_MAX_CHARS = int(os.getenv("EXTRACT_MAX_CHARS", "200000"))
+# Páginas extraídas por tarefa no pool de processos
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+async def spool_upload(file, suffix: str = "", max_bytes: int = UPLOAD_MAX_BYTES) -> str:
+    """
+    Copia o upload em blocos para um arquivo temporário e retorna o caminho.
+    O arquivo nunca é carregado inteiro em memória.
+    """
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Arquivo excede o limite de {max_bytes} bytes")
+                await run_blocking(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _read_txt(path: str, max_chars: int) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read(max_chars)
+
+
+def preload():
+    """Importa o PyMuPDF antecipadamente (aquecimento em segundo plano)."""
+    import fitz  # noqa: F401
+
+
+def _page_count(path: str) -> int:
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as pdf:
+        return pdf.page_count
+
+
+def _extract_pages(path: str, start: int, stop: int, max_chars: int) -> List[str]:
+    """Executado no pool de processos: abre o PDF pelo caminho e lê um intervalo de páginas."""
+    import fitz  # PyMuPDF
+
+    parts = []
+    total = 0
+    with fitz.open(path) as pdf:
+        for number in range(start, stop):
+            text = pdf[number].get_text()
+            parts.append(text)
+            total += len(text)
+            if total >= max_chars:
+                break
+    return parts
+
+
+def _join_limited(parts: List[str], max_chars: int) -> str:
+    selected = []
+    total = 0
+    for part in parts:
+        if total + len(part) >= max_chars:
+            selected.append(part[:max_chars - total])
+            break
+        selected.append(part)
+        total += len(part)
+    return "".join(selected)
+
+
+async def extract_file(path: str, filename: str) -> str:
+    """Extrai o texto de um .txt ou .pdf respeitando os limites de páginas e caracteres."""
+    if not filename.lower().endswith(".pdf"):
+        return await run_blocking(_read_txt, path, EXTRACT_MAX_CHARS)
+
+    pages = min(await run_blocking(_page_count, path), PDF_MAX_PAGES)
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, pages)) for start in range(0, pages, PDF_PAGES_PER_TASK)]
+    chunks = await asyncio.gather(
+        *(run_in_process(_extract_pages, path, start, stop, EXTRACT_MAX_CHARS) for start, stop in ranges)
+    )
+    # Junta as páginas uma única vez, na ordem original
+    return _join_limited([part for chunk in chunks for part in chunk], EXTRACT_MAX_CHARS)
@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from utils.preprocessor import anonymize_text
+
+# Arquivo JSONL onde as correções enviadas pelos usuários são acrescentadas
+FEEDBACK_PATH = os.getenv(
+    "FEEDBACK_PATH", str(Path(__file__).resolve().parent.parent.parent / "feedback" / "feedback.jsonl")
+)
+# Percentual das correções reservado para validação (nunca usado no treino)
+FEEDBACK_HOLDOUT_PERCENT = int(os.getenv("FEEDBACK_HOLDOUT_PERCENT", "20"))
+
+CATEGORIES = ("Produtivo", "Improdutivo")
+
+
+def normalize_category(category: str) -> Optional[str]:
+    """Categoria no formato canônico, ou None se não for reconhecida."""
+    value = (category or "").strip().lower()
+    for name in CATEGORIES:
+        if value == name.lower():
+            return name
+    return None
+
+
+def is_holdout(feedback_id: str, percent: int = FEEDBACK_HOLDOUT_PERCENT) -> bool:
+    # Decidido pelo id: a mesma correção fica sempre do mesmo lado da divisão
+    return int(feedback_id[:8], 16) % 100 < percent
+
+
+class FeedbackStore:
+    """
+    Correções rotuladas em um arquivo JSONL só de acréscimo. Cada registro é
+    gravado com uma única escrita em modo O_APPEND, então vários workers podem
+    acrescentar ao mesmo arquivo sem intercalar linhas. O texto é anonimizado
+    antes de ir para o disco, como no dataset de treino.
+    """
+
+    def __init__(self, path: str = FEEDBACK_PATH):
+        self.path = Path(path)
+
+    def add(self, text: str, category: str, predicted: Optional[str] = None,
+            model_version: Optional[str] = None) -> Dict:
+        record = {
+            "id": uuid.uuid4().hex,
+            "texto": anonymize_text(text),
+            "categoria": category,
+            "categoria_prevista": predicted,
+            "modelo_versao": model_version,
+            "criado_em": time.time(),
+        }
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        return record
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+        """
+        Registros completos entre os bytes start e end, com o byte onde cada um
+        termina. Uma linha ainda sem o "\\n" final (escrita em andamento) é ignorada.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(start)
+            position = start
+            for line in f:
+                if not line.endswith(b"\n") or (end is not None and position + len(line) > end):
+                    return
+                position += len(line)
+                try:
+                    yield position, json.loads(line)
+                except json.JSONDecodeError as e:
+                    logging.warning(f"Registro de feedback inválido ignorado: {e}")
+
+
+feedback_store = FeedbackStore()
@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.storage import ProcessLocalSQLite
+
+# Banco SQLite com o progresso e os resultados dos jobs (compartilhado entre workers)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(tempfile.gettempdir(), "autou-jobs.db"))
+# Tempo (segundos) que jobs terminados e seus resultados são mantidos
+JOBS_TTL = float(os.getenv("JOBS_TTL", str(7 * 86400)))
+
+QUEUED, RUNNING, DONE, FAILED = "na_fila", "processando", "concluido", "erro"
+FINAL_STATUSES = (DONE, FAILED)
+
+_JOB_FIELDS = ("id", "status", "arquivo", "sugerir_resposta", "processados", "erros", "total",
+               "erro", "criado_em", "atualizado_em")
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    Estado dos jobs de ingestão em SQLite: qualquer worker consulta o progresso
+    e os resultados, que são gravados em lotes e lidos em páginas.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH, ttl: float = JOBS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            self._db = ProcessLocalSQLite(path, [
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, arquivo TEXT NOT NULL, "
+                "sugerir_resposta INTEGER NOT NULL, processados INTEGER NOT NULL DEFAULT 0, "
+                "erros INTEGER NOT NULL DEFAULT 0, total INTEGER, erro TEXT, pid INTEGER, "
+                "criado_em REAL NOT NULL, atualizado_em REAL NOT NULL)",
+                "CREATE TABLE IF NOT EXISTS job_results ("
+                "job_id TEXT NOT NULL, indice INTEGER NOT NULL, dados TEXT NOT NULL, "
+                "PRIMARY KEY (job_id, indice))",
+            ])
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao abrir banco de jobs em {path}: {e}. Jobs indisponíveis.")
+
+    @property
+    def available(self) -> bool:
+        return self._db is not None
+
+    def create(self, filename: str, with_response: bool) -> Dict:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, arquivo, sugerir_resposta, pid, criado_em, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, filename, int(with_response), os.getpid(), now, now),
+            )
+        self.purge_expired()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_JOB_FIELDS, row))
+        job["sugerir_resposta"] = bool(job["sugerir_resposta"])
+        return job
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None, total: Optional[int] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, erro = ?, total = COALESCE(?, total), pid = ?, atualizado_em = ? "
+                "WHERE id = ?",
+                (status, error, total, os.getpid(), time.time(), job_id),
+            )
+
+    def add_results(self, job_id: str, results: List[Tuple[int, Dict]], errors: int = 0) -> bool:
+        """Grava um lote de resultados e o progresso numa única transação. False se o job foi removido."""
+        with self._lock:
+            conn = self._db.conn
+            conn.execute("BEGIN")
+            try:
+                updated = conn.execute(
+                    "UPDATE jobs SET processados = processados + ?, erros = erros + ?, atualizado_em = ? "
+                    "WHERE id = ?",
+                    (len(results), errors, time.time(), job_id),
+                ).rowcount
+                if updated:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO job_results (job_id, indice, dados) VALUES (?, ?, ?)",
+                        [(job_id, index, json.dumps(data, ensure_ascii=False)) for index, data in results],
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return bool(updated)
+
+    def iter_results(self, job_id: str, offset: int = 0, limit: Optional[int] = None,
+                     page_size: int = 500) -> Iterator[Dict]:
+        """Resultados em ordem, lidos do banco página a página."""
+        remaining = limit
+        after = offset - 1
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT indice, dados FROM job_results WHERE job_id = ? AND indice > ? "
+                    "ORDER BY indice LIMIT ?",
+                    (job_id, after, size),
+                ).fetchall()
+            if not rows:
+                return
+            for index, data in rows:
+                yield json.loads(data)
+            after = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fail_orphans(self):
+        """Marca como erro jobs em andamento cujo processo não existe mais (ex.: reinício)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, pid FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+        for job_id, pid in rows:
+            if not _pid_alive(pid):
+                logging.warning(f"Job {job_id} interrompido (processo {pid} encerrado)")
+                self.set_status(job_id, FAILED, "Job interrompido pelo reinício do servidor")
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [row[0] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND atualizado_em < ?", (*FINAL_STATUSES, cutoff)
+            ).fetchall()]
+        for job_id in expired:
+            self.delete(job_id)
+
+
+job_store = JobStore()
@@ -0,0 +1,104 @@
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from utils.preprocessor import clean_text
+
+# Arquivo com as palavras-chave produtivas e seus pesos
+KEYWORDS_PATH = os.getenv(
+    "KEYWORDS_PATH", str(Path(__file__).resolve().parent.parent / "config" / "keywords.json")
+)
+# Pontuação mínima para classificar um email como Produtivo
+KEYWORDS_THRESHOLD = float(os.getenv("KEYWORDS_THRESHOLD", "1.0"))
+
+DEFAULT_KEYWORDS = [
+    "suporte", "problema", "erro", "status", "atualizacao", "duvida", "reuniao", "contrato",
+    "anexo", "urgente", "processo", "solicitacao", "chamado", "ajuda", "cliente", "projeto",
+    "prazo", "entrega", "relatorio", "documento", "pagamento", "fatura", "nota fiscal",
+    "orcamento", "proposta",
+]
+
+
+def _inflections(word: str) -> List[str]:
+    """Formas aceitas de uma palavra já limpa: ela mesma e os plurais regulares (s/es, ão, l, m)."""
+    forms = [word, word + "s", word + "es"]
+    if word.endswith("ao"):
+        forms += [word[:-2] + "oes", word[:-2] + "aes"]
+    elif word.endswith("l"):
+        forms.append(word[:-1] + "is")
+    elif word.endswith("m"):
+        forms.append(word[:-1] + "ns")
+    return forms
+
+
+def _contains_phrase(text: str, phrase: str) -> bool:
+    # O texto limpo separa palavras com um único espaço: basta conferir as bordas
+    start = text.find(phrase)
+    while start != -1:
+        end = start + len(phrase)
+        if (start == 0 or text[start - 1] == " ") and (end == len(text) or text[end] == " "):
+            return True
+        start = text.find(phrase, start + 1)
+    return False
+
+
+class KeywordMatch(NamedTuple):
+    score: float
+    terms: List[str]
+
+
+class KeywordMatcher:
+    """
+    Casa todas as palavras-chave de uma vez sobre o texto já limpo (saída de
+    clean_text): uma única divisão em palavras e uma interseção de conjuntos
+    para termos simples; termos compostos só são procurados quando todas as
+    suas palavras aparecem no texto. Plurais regulares casam com o termo no
+    singular ("erros" -> "erro", "reuniões" -> "reunião").
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        # Normaliza como o texto de entrada (sem acentos, minúsculas) e remove duplicatas
+        self.weights: Dict[str, float] = {}
+        for term, weight in weights.items():
+            normalized = clean_text(term)
+            if normalized:
+                self.weights[normalized] = max(float(weight), self.weights.get(normalized, 0.0))
+        # Forma flexionada -> termo; a forma exata de um termo tem precedência sobre o plural de outro
+        self._words: Dict[str, str] = {t: t for t in self.weights if " " not in t}
+        for term in list(self._words):
+            for form in _inflections(term):
+                self._words.setdefault(form, term)
+        self._phrases = []
+        for term in (t for t in self.weights if " " in t):
+            for words in itertools.product(*(_inflections(w) for w in term.split())):
+                self._phrases.append((term, " ".join(words), frozenset(words)))
+
+    @classmethod
+    def from_file(cls, path: str) -> "KeywordMatcher":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            logging.warning(f"Arquivo de palavras-chave não encontrado em {path}. Usando lista padrão.")
+        except (ValueError, TypeError, AttributeError) as e:
+            logging.error(f"Arquivo de palavras-chave inválido em {path}: {e}. Usando lista padrão.")
+        return cls({term: 1.0 for term in DEFAULT_KEYWORDS})
+
+    def match(self, text_cleaned: str) -> KeywordMatch:
+        """Retorna a soma dos pesos dos termos encontrados e os termos, do maior peso ao menor."""
+        if not text_cleaned:
+            return KeywordMatch(0.0, [])
+        words = set(text_cleaned.split())
+        found = {self._words[w] for w in words.intersection(self._words)}
+        for term, phrase, parts in self._phrases:
+            if term not in found and parts <= words and _contains_phrase(text_cleaned, phrase):
+                found.add(term)
+        terms = list(found)
+        terms.sort(key=lambda t: (-self.weights[t], t))
+        return KeywordMatch(sum((self.weights[t] for t in terms), 0.0), terms)
+
+
+keyword_matcher = KeywordMatcher.from_file(KEYWORDS_PATH)
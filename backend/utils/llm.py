@@ -0,0 +1,474 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from utils.metrics import LLM_COALESCED, LLM_REQUESTS, Callback, timed
+
+T = TypeVar("T")
+
+# Limite de chamadas simultâneas ao Gemini por worker
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Prazo máximo (segundos) de uma chamada ao Gemini, incluindo a espera na fila
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+# Falhas seguidas que abrem o disjuntor (0 desativa) e segundos até testar de novo
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+# Orçamento aproximado de tokens do texto do email enviado ao Gemini (0 desativa o corte)
+LLM_PROMPT_MAX_TOKENS = int(os.getenv("LLM_PROMPT_MAX_TOKENS", "1500"))
+# "gemini" (padrão) ou "stub" para o substituto local usado nos testes de carga
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 1024,
+}
+
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+]
+
+
+class GeminiClient:
+    """
+    Modelo Gemini criado sob demanda em cada processo. O cliente (gRPC/HTTP)
+    não pode ser herdado pelo fork dos workers: se o PID mudou, é recriado.
+    """
+
+    def __init__(self, purpose: str):
+        self.purpose = purpose
+        self._model = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._model = self._create()
+                    self._pid = os.getpid()
+        return self._model
+
+    def _create(self):
+        if LLM_BACKEND == "stub":
+            from utils.llm_stub import StubGenerativeModel
+
+            logging.warning(f"LLM_BACKEND=stub: usando Gemini simulado para {self.purpose}")
+            return StubGenerativeModel()
+
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            logging.warning(f"GOOGLE_API_KEY não encontrada. Google AI indisponível para {self.purpose}; usando respostas padrão.")
+            return None
+        try:
+            import google.generativeai as genai
+
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel(
+                model_name="gemini-pro",
+                generation_config=GENERATION_CONFIG,
+                safety_settings=SAFETY_SETTINGS
+            )
+            logging.info(f"Google AI Gemini configurado com sucesso para {self.purpose}")
+            return model
+        except Exception as e:
+            logging.error(f"Erro ao configurar Google AI para {self.purpose}: {e}")
+            return None
+
+
+class CircuitOpenError(Exception):
+    """O circuito do Gemini está aberto: a chamada falha imediatamente."""
+
+
+class CircuitBreaker:
+    """
+    Disjuntor das chamadas ao Gemini. Depois de `failures` erros seguidos abre e
+    recusa chamadas por `reset_after` segundos; então deixa passar uma única
+    chamada de teste (meio aberto), que fecha o circuito se der certo ou o
+    reabre se falhar. Compartilhado por respostas e chat, que usam o mesmo serviço.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "fechado", "aberto", "meio_aberto"
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, reset_after: float = LLM_BREAKER_RESET):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> Tuple[bool, bool]:
+        """Retorna (chamada permitida, é a chamada de teste do estado meio aberto)."""
+        if self.failures <= 0:
+            return True, False
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_after:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True, False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True, True
+            return False, False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logging.info("Circuito do Google AI fechado: serviço respondeu novamente")
+            self.state = self.CLOSED
+            self._consecutive = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and 0 < self.failures <= self._consecutive):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                logging.warning(f"Circuito do Google AI aberto após {self._consecutive} falhas seguidas; "
+                                f"usando respostas padrão por {self.reset_after:.0f}s")
+
+    def release_probe(self):
+        # Chamada de teste terminou sem resultado (cancelada ou presa na fila)
+        with self._lock:
+            self._probing = False
+
+
+breaker = CircuitBreaker()
+
+Callback("autou_llm_circuito_estado", "Estado do disjuntor das chamadas ao Gemini (1 no estado atual)", "gauge",
+         ["estado"], lambda: (((state,), int(breaker.state == state))
+                              for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)))
+
+
+def prompt_key(*parts: str) -> str:
+    """Chave de coalescência: hash do conteúdo enviado ao Gemini."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+_CHARS_PER_TOKEN = 4
+_HEADER_RE = re.compile(r"^[\w-]{1,40}:[ \t]")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_OMITTED = "\n\n[...]\n\n"
+
+
+def _cut(text: str, limit: int, from_end: bool = False) -> str:
+    """Até `limit` caracteres do início (ou do fim) do texto, sem partir palavras."""
+    if len(text) <= limit:
+        return text
+    if from_end:
+        piece = text[len(text) - limit:]
+        space = piece.find(" ")
+        return piece[space + 1:] if 0 <= space < limit // 2 else piece
+    piece = text[:limit]
+    space = piece.rfind(" ")
+    return piece[:space] if space > limit // 2 else piece
+
+
+def trim_to_token_budget(text: str, max_tokens: int = LLM_PROMPT_MAX_TOKENS) -> str:
+    """
+    Reduz o texto a ~max_tokens (4 caracteres por token) mantendo o que mais
+    informa sobre o email: cabeçalhos (De:, Assunto: ...), os primeiros
+    parágrafos e os últimos. O trecho omitido é marcado com [...].
+    """
+    budget = max_tokens * _CHARS_PER_TOKEN
+    if max_tokens <= 0 or len(text) <= budget:
+        return text
+
+    lines = text.strip().splitlines()
+    headers = []
+    while lines and _HEADER_RE.match(lines[0]):
+        headers.append(lines.pop(0))
+    header = _cut("\n".join(headers), budget // 4)
+    body = "\n".join(lines).strip()
+    # Texto extraído de PDF costuma não ter linhas em branco: usa as linhas como unidades
+    units = [p.strip() for p in _PARAGRAPH_RE.split(body) if p.strip()]
+    separator = "\n\n"
+    if len(units) < 3:
+        units = [line.strip() for line in lines if line.strip()]
+        separator = "\n"
+
+    remaining = max(budget - len(header) - len(_OMITTED), 0)
+    head_budget = remaining * 2 // 3
+    head, used, last_head = [], 0, -1
+    for i, unit in enumerate(units):
+        if used + len(unit) > head_budget:
+            if not head:
+                head.append(_cut(unit, head_budget))
+                used = len(head[0])
+            break
+        head.append(unit)
+        used += len(unit) + len(separator)
+        last_head = i
+
+    tail_budget = remaining - used
+    tail, used = [], 0
+    for i in range(len(units) - 1, last_head, -1):
+        if used + len(units[i]) > tail_budget:
+            if not tail:
+                tail.append(_cut(units[i], tail_budget, from_end=True))
+            break
+        tail.append(units[i])
+        used += len(units[i]) + len(separator)
+
+    parts = [header] if header else []
+    parts.append(separator.join(head) + _OMITTED + separator.join(reversed(tail)))
+    return "\n\n".join(parts).strip()
+
+
+class _SyncCall:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalescência de chamadas idênticas em andamento: quem chega com a mesma
+    chave enquanto a primeira chamada não terminou aguarda e recebe o mesmo
+    resultado (ou a mesma exceção), em vez de chamar o Gemini de novo.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self._calls: Dict[str, _SyncCall] = {}
+        self._lock = threading.Lock()
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]], purpose: str = "llm") -> T:
+        task = self._tasks.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            LLM_COALESCED.inc(finalidade=purpose)
+        else:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None) if self._tasks.get(key) is task else None)
+        # O cancelamento de um dos interessados não cancela a chamada dos demais
+        return await asyncio.shield(task)
+
+    def do_sync(self, key: str, func: Callable[[], T], purpose: str = "llm") -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _SyncCall()
+        if not leader:
+            LLM_COALESCED.inc(finalidade=purpose)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+singleflight = SingleFlight()
+
+
+_semaphore: Optional[asyncio.Semaphore] = None
+_semaphore_loop = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # O semáforo pertence ao event loop em execução (um por worker)
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+def _check_breaker(purpose: str) -> bool:
+    allowed, probe = breaker.allow()
+    if not allowed:
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="circuito_aberto")
+        raise CircuitOpenError("Circuito do Google AI aberto")
+    return probe
+
+
+async def _acquire(semaphore: asyncio.Semaphore, deadline: float, purpose: str, probe: bool):
+    """Aguarda uma vaga no semáforo sem ultrapassar o prazo total da chamada."""
+    try:
+        with timed("llm_espera"):
+            await asyncio.wait_for(semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+    except BaseException as e:
+        if probe:
+            breaker.release_probe()
+        if isinstance(e, asyncio.TimeoutError):
+            # Fila cheia não indica falha do serviço: não conta para o disjuntor
+            LLM_REQUESTS.inc(finalidade=purpose, resultado="timeout_fila")
+        raise
+
+
+_sync_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_sync_executor_lock = threading.Lock()
+
+
+def _get_sync_executor() -> concurrent.futures.ThreadPoolExecutor:
+    # Limita as chamadas síncronas simultâneas como o semáforo faz com as assíncronas
+    global _sync_executor
+    with _sync_executor_lock:
+        if _sync_executor is None:
+            _sync_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+        return _sync_executor
+
+
+def call_llm_sync(func: Callable[[], T], timeout: Optional[float] = None, purpose: str = "llm") -> T:
+    """
+    Versão síncrona de call_llm, para os caminhos que rodam fora do event loop.
+    O SDK síncrono não aceita prazo por chamada: a chamada roda num pool
+    próprio e quem chamou desiste após o prazo (espera na fila + chamada),
+    levantando concurrent.futures.TimeoutError. A thread do pool só é liberada
+    quando o SDK retornar.
+    """
+    timeout = LLM_TIMEOUT if timeout is None else timeout
+    probe = _check_breaker(purpose)
+    context = contextvars.copy_context()
+    future = _get_sync_executor().submit(context.run, func)
+    try:
+        with timed(f"llm_{purpose}"):
+            result = future.result(timeout)
+        breaker.record_success()
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="sucesso")
+        return result
+    except concurrent.futures.TimeoutError:
+        if future.cancel():
+            # Nem começou: fila cheia não indica falha do serviço
+            LLM_REQUESTS.inc(finalidade=purpose, resultado="timeout_fila")
+        else:
+            breaker.record_failure()
+            LLM_REQUESTS.inc(finalidade=purpose, resultado="timeout")
+            logging.error(f"Chamada ao Google AI excedeu {timeout:.1f}s")
+        raise
+    except Exception:
+        breaker.record_failure()
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="erro")
+        raise
+    finally:
+        if probe:
+            breaker.release_probe()
+
+
+async def call_llm(factory: Callable[[], Awaitable[T]], timeout: Optional[float] = None,
+                   purpose: str = "llm") -> T:
+    """
+    Executa uma chamada assíncrona ao LLM respeitando o limite de concorrência,
+    o prazo (espera na fila + chamada) e o disjuntor. Levanta asyncio.TimeoutError
+    se exceder o prazo e CircuitOpenError se o circuito estiver aberto.
+    """
+    timeout = LLM_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    probe = _check_breaker(purpose)
+    semaphore = _get_semaphore()
+    await _acquire(semaphore, deadline, purpose, probe)
+    try:
+        with timed(f"llm_{purpose}"):
+            result = await asyncio.wait_for(factory(), max(0.0, deadline - time.monotonic()))
+        breaker.record_success()
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="sucesso")
+        return result
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="timeout")
+        logging.error(f"Chamada ao Google AI excedeu {timeout:.1f}s")
+        raise
+    except Exception:
+        breaker.record_failure()
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="erro")
+        raise
+    finally:
+        if probe:
+            breaker.release_probe()
+        semaphore.release()
+
+
+async def stream_llm(factory: Callable[[], Awaitable], timeout: Optional[float] = None,
+                     purpose: str = "llm") -> AsyncIterator[str]:
+    """
+    Versão em streaming de call_llm: produz os trechos de texto à medida que
+    chegam. O prazo vale até o primeiro trecho e depois para cada trecho seguinte.
+    """
+    timeout = LLM_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    probe = _check_breaker(purpose)
+    semaphore = _get_semaphore()
+    await _acquire(semaphore, deadline, purpose, probe)
+    try:
+        # Etapa medida até o primeiro trecho: o restante depende do ritmo do cliente
+        with timed(f"llm_{purpose}"):
+            response = await asyncio.wait_for(factory(), max(0.0, deadline - time.monotonic()))
+            chunks = response.__aiter__()
+            first = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+        breaker.record_success()
+        if first.text:
+            yield first.text
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+            except StopAsyncIteration:
+                break
+            if chunk.text:
+                yield chunk.text
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="sucesso")
+    except StopAsyncIteration:
+        breaker.record_success()
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="sucesso")
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="timeout")
+        logging.error(f"Streaming do Google AI excedeu {timeout:.1f}s")
+        raise
+    except Exception:
+        breaker.record_failure()
+        LLM_REQUESTS.inc(finalidade=purpose, resultado="erro")
+        raise
+    finally:
+        if probe:
+            breaker.release_probe()
+        semaphore.release()
@@ -0,0 +1,95 @@
+"""
+Substituto local do Gemini para testes de carga: imita a interface de
+google.generativeai.GenerativeModel usada pelo app (generate_content,
+generate_content_async, start_chat/send_message[_async], com ou sem stream),
+com latência e taxa de erro configuráveis e sem acesso à rede.
+Ativado com LLM_BACKEND=stub.
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List
+
+# Latência média (ms) de cada resposta simulada e variação aleatória em torno dela
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "300"))
+LLM_STUB_JITTER_MS = float(os.getenv("LLM_STUB_JITTER_MS", "100"))
+# Fração das chamadas (0 a 1) que falham com erro simulado
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+# Número de trechos em que a resposta é dividida no modo streaming
+LLM_STUB_CHUNKS = int(os.getenv("LLM_STUB_CHUNKS", "4"))
+
+STUB_REPLY = (
+    "Olá! Agradecemos o contato. Nossa equipe recebeu sua mensagem e "
+    "retornará assim que possível com as informações solicitadas."
+)
+
+
+class StubError(RuntimeError):
+    """Falha simulada de uma chamada ao Gemini."""
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubStreamResponse:
+    """Resposta em streaming: iterável assíncrono de trechos com atributo text."""
+
+    def __init__(self, model: "StubGenerativeModel", text: str):
+        self._model = model
+        self._text = text
+
+    async def __aiter__(self):
+        words = self._text.split(" ")
+        size = max(1, -(-len(words) // max(1, self._model.chunks)))
+        for start in range(0, len(words), size):
+            await asyncio.sleep(self._model._delay() / self._model.chunks)
+            suffix = " " if start + size < len(words) else ""
+            yield StubResponse(" ".join(words[start:start + size]) + suffix)
+
+
+class StubChatSession:
+    def __init__(self, model: "StubGenerativeModel", history: List[Dict] = None):
+        self._model = model
+        self.history = list(history or [])
+
+    def send_message(self, message: str, stream: bool = False):
+        return self._model.generate_content(message)
+
+    async def send_message_async(self, message: str, stream: bool = False):
+        return await self._model.generate_content_async(message, stream=stream)
+
+
+class StubGenerativeModel:
+    def __init__(self, latency_ms: float = LLM_STUB_LATENCY_MS, jitter_ms: float = LLM_STUB_JITTER_MS,
+                 error_rate: float = LLM_STUB_ERROR_RATE, chunks: int = LLM_STUB_CHUNKS):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.chunks = max(1, chunks)
+
+    def _delay(self) -> float:
+        return max(0.0, random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)) / 1000
+
+    def _maybe_fail(self):
+        if self.error_rate > 0 and random.random() < self.error_rate:
+            raise StubError("Erro simulado do Gemini (LLM_BACKEND=stub)")
+
+    def generate_content(self, prompt: str):
+        time.sleep(self._delay())
+        self._maybe_fail()
+        return StubResponse(STUB_REPLY)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        if stream:
+            # No streaming a latência é distribuída entre os trechos
+            self._maybe_fail()
+            return StubStreamResponse(self, STUB_REPLY)
+        await asyncio.sleep(self._delay())
+        self._maybe_fail()
+        return StubResponse(STUB_REPLY)
+
+    def start_chat(self, history: List[Dict] = None) -> StubChatSession:
+        return StubChatSession(self, history)
@@ -0,0 +1,161 @@
+"""
+Leitura em streaming de exportações de caixas de email (.mbox, .eml e .zip).
+Os geradores produzem uma mensagem por vez: o arquivo nunca é carregado inteiro
+em memória, seja qual for o tamanho da exportação.
+"""
+import html
+import logging
+import os
+import re
+import zipfile
+from email.header import decode_header, make_header
+from email.message import Message
+from email.parser import BytesParser
+from typing import BinaryIO, Dict, Iterator
+
+from utils.extractor import EXTRACT_MAX_CHARS
+
+# Tamanho máximo (bytes) lido de cada mensagem; o excedente é descartado
+MAIL_MAX_MESSAGE_BYTES = int(os.getenv("MAIL_MAX_MESSAGE_BYTES", str(10 * 1024 * 1024)))
+
+MAILBOX_EXTENSIONS = (".mbox", ".mbx", ".eml", ".zip")
+
+# Bytes lidos por vez ao separar um mbox (linhas maiores chegam em pedaços)
+_LINE_LIMIT = 64 * 1024
+
+_TAG_RE = re.compile(r"<(script|style)\b.*?</\1\s*>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+# Política compat32: o parser de cabeçalhos de policy.default é ~20x mais lento
+# e aqui só precisamos de alguns cabeçalhos decodificados
+_parser = BytesParser()
+
+
+def is_mailbox_file(filename: str) -> bool:
+    return filename.lower().endswith(MAILBOX_EXTENSIONS)
+
+
+def split_mbox(stream: BinaryIO, max_bytes: int = MAIL_MAX_MESSAGE_BYTES) -> Iterator[bytes]:
+    """
+    Separa um mbox (arquivo binário) nas mensagens brutas, uma por vez. Lê no
+    máximo _LINE_LIMIT bytes por vez: um upload sem quebras de linha não é
+    carregado inteiro em memória como uma única linha.
+    """
+    buffer = []
+    size = 0
+    line_start = True
+    while True:
+        line = stream.readline(_LINE_LIMIT)
+        if not line:
+            break
+        # Pedaços do meio de uma linha longa nunca iniciam mensagem nem são escape
+        starts_line, line_start = line_start, line.endswith(b"\n")
+        if starts_line and line.startswith(b"From "):
+            if buffer:
+                yield b"".join(buffer)
+            buffer = []
+            size = 0
+            continue
+        if size >= max_bytes:
+            continue
+        # Desfaz o escape ">From " do formato mboxrd
+        if starts_line and line.startswith(b">") and line.lstrip(b">").startswith(b"From "):
+            line = line[1:]
+        buffer.append(line)
+        size += len(line)
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _header(message: Message, name: str) -> str:
+    value = message.get(name)
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(value)))
+    except (LookupError, UnicodeError, ValueError):
+        return str(value)
+
+
+def _html_to_text(markup: str) -> str:
+    return html.unescape(_TAG_RE.sub(" ", markup))
+
+
+def _body_text(message: Message) -> str:
+    """Primeira parte text/plain (ou text/html, sem as tags) que não seja anexo."""
+    plain = rich = None
+    for part in message.walk():
+        if part.is_multipart() or part.get_content_disposition() == "attachment":
+            continue
+        content_type = part.get_content_type()
+        if content_type == "text/plain" and plain is None:
+            plain = part
+        elif content_type == "text/html" and rich is None:
+            rich = part
+    part = plain or rich
+    if part is None:
+        return ""
+    payload = part.get_payload(decode=True) or b""
+    try:
+        content = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    except LookupError:
+        content = payload.decode("utf-8", errors="replace")
+    if part is rich:
+        content = _html_to_text(content)
+    return content
+
+
+def parse_message(raw: bytes, origin: str) -> Dict:
+    """Converte uma mensagem bruta no registro usado pelos jobs."""
+    message = _parser.parsebytes(raw)
+    subject = _header(message, "subject")
+    body = _body_text(message)
+    return {
+        "origem": origin,
+        "message_id": _header(message, "message-id") or None,
+        "assunto": subject,
+        "remetente": _header(message, "from"),
+        "data": _header(message, "date") or None,
+        "texto": f"{subject}\n\n{body}"[:EXTRACT_MAX_CHARS],
+    }
+
+
+def _safe_parse(raw: bytes, origin: str) -> Dict:
+    try:
+        return parse_message(raw, origin)
+    except Exception as e:
+        logging.warning(f"Mensagem ilegível em {origin}: {e}")
+        return {"origem": origin, "erro": f"Mensagem ilegível: {e}"}
+
+
+def _iter_zip(path: str) -> Iterator[Dict]:
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            lower = name.lower()
+            if info.is_dir():
+                continue
+            if lower.endswith(".eml"):
+                with archive.open(info) as stream:
+                    yield _safe_parse(stream.read(MAIL_MAX_MESSAGE_BYTES), name)
+            elif lower.endswith((".mbox", ".mbx")):
+                with archive.open(info) as stream:
+                    for number, raw in enumerate(split_mbox(stream)):
+                        yield _safe_parse(raw, f"{name}#{number}")
+            elif lower.endswith(".txt"):
+                with archive.open(info) as stream:
+                    text = stream.read(EXTRACT_MAX_CHARS).decode("utf-8", errors="ignore")
+                yield {"origem": name, "message_id": None, "assunto": "", "remetente": "", "data": None,
+                       "texto": text}
+
+
+def iter_messages(path: str, filename: str) -> Iterator[Dict]:
+    """Mensagens de um arquivo .mbox, .eml ou .zip (com .eml, .mbox ou .txt dentro)."""
+    lower = filename.lower()
+    if lower.endswith(".zip"):
+        yield from _iter_zip(path)
+    elif lower.endswith(".eml"):
+        with open(path, "rb") as f:
+            yield _safe_parse(f.read(MAIL_MAX_MESSAGE_BYTES), filename)
+    else:
+        with open(path, "rb") as f:
+            for number, raw in enumerate(split_mbox(f)):
+                yield _safe_parse(raw, f"{filename}#{number}")
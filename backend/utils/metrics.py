@@ -0,0 +1,264 @@
+"""
+Métricas do serviço no formato texto do Prometheus, sem dependências externas.
+
+Contadores e histogramas ficam em memória, por processo. Com vários workers do
+gunicorn cada um expõe as próprias séries, diferenciadas pelo rótulo "worker"
+(PID); no Prometheus, some por worker (sum without (worker) ...).
+
+timed(etapa) mede uma etapa do processamento: registra a duração no histograma
+de etapas e, dentro de uma requisição, acumula para o cabeçalho Server-Timing.
+"""
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Inclui o cabeçalho Server-Timing com as etapas de cada requisição
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List = []
+# Etapas medidas na requisição atual: lista de (nome, segundos)
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = list(zip(names, values)) + [("worker", os.getpid())]
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Para cada combinação de rótulos: [contagens por bucket..., soma]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+                    break
+            data[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(data)) for key, data in self._values.items()]
+        lines = self.header()
+        names = self.labelnames + ("le",)
+        for key, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(data[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Callback(_Metric):
+    """Métrica lida de outro componente no momento da coleta (ex.: estatísticas do cache)."""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        try:
+            items = list(self._collect())
+        except Exception:
+            items = []
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items
+        ]
+
+
+def render() -> str:
+    """Todas as métricas registradas, no formato de exposição texto do Prometheus."""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Métricas do serviço
+STAGE_SECONDS = Histogram(
+    "autou_etapa_duracao_segundos", "Duração de cada etapa do processamento", ["etapa"]
+)
+HTTP_REQUESTS = Counter(
+    "autou_http_requisicoes_total", "Requisições HTTP atendidas", ["rota", "metodo", "status"]
+)
+HTTP_SECONDS = Histogram(
+    "autou_http_duracao_segundos", "Duração das requisições HTTP", ["rota", "metodo"]
+)
+CLASSIFICATIONS = Counter(
+    "autou_classificacoes_total", "Emails classificados, por método (modelo ou fallback por keywords)", ["metodo"]
+)
+MODEL_LOADS = Counter(
+    "autou_modelo_carregamentos_total", "Tentativas de carregar uma nova versão do modelo", ["resultado"]
+)
+MODEL_UPDATES = Counter(
+    "autou_modelo_atualizacoes_total", "Atualizações do modelo com feedback, por resultado", ["resultado"]
+)
+FEEDBACK_RECEIVED = Counter(
+    "autou_feedback_total", "Correções recebidas em /feedback, por categoria informada", ["categoria"]
+)
+LLM_REQUESTS = Counter(
+    "autou_llm_chamadas_total", "Chamadas ao Gemini, por finalidade e resultado", ["finalidade", "resultado"]
+)
+LLM_FALLBACKS = Counter(
+    "autou_llm_respostas_padrao_total", "Respostas padrão usadas no lugar do Gemini", ["finalidade"]
+)
+LLM_COALESCED = Counter(
+    "autou_llm_chamadas_evitadas_total",
+    "Chamadas ao Gemini evitadas por aguardarem uma chamada idêntica já em andamento", ["finalidade"]
+)
+LLM_SKIPPED = Counter(
+    "autou_llm_chamadas_dispensadas_total",
+    "Respostas com template sem chamar o Gemini (Improdutivo com confiança >= RESPONSE_TEMPLATE_CONFIDENCE)",
+    ["finalidade"]
+)
+LLM_EARLY_TEMPLATES = Counter(
+    "autou_llm_respostas_antecipadas_total",
+    "Templates devolvidos por LLM_TEMPLATE_AFTER_MS enquanto o Gemini segue em segundo plano", ["finalidade"]
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """Mede a duração do bloco como a etapa `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, etapa=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def start_request() -> List[Tuple[str, float]]:
+    """Inicia a coleta das etapas da requisição atual (usado pelo middleware)."""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """Agrega as etapas (somando repetições) no formato do cabeçalho Server-Timing."""
+    durations: Dict[str, float] = {}
+    for stage, elapsed in timings:
+        durations[stage] = durations.get(stage, 0.0) + elapsed
+    parts = [f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in durations.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que conta e mede as requisições por rota e, com
+    SERVER_TIMING=1, devolve as etapas medidas no cabeçalho Server-Timing.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_request()
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = server_timing_header(timings, time.perf_counter() - start)
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", header.encode("latin-1")))
+                    headers.append((b"timing-allow-origin", b"*"))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            # O roteador grava a rota encontrada no scope; usa o modelo do caminho
+            # (ex.: /chat/{session_id}) para não criar uma série por URL
+            route = getattr(scope.get("route"), "path", None) or "outros"
+            HTTP_REQUESTS.inc(rota=route, metodo=scope["method"], status=status)
+            HTTP_SECONDS.observe(elapsed, rota=route, metodo=scope["method"])
@@ -1,20 +1,53 @@
 import re
+import string
 import unicodedata
+from typing import Iterable, Iterator
+
+_KEEP = frozenset(map(ord, string.ascii_lowercase + string.digits))
+
+# Tabelas de tradução (bytes) pré-calculadas: mantém [a-z0-9] e troca o resto por espaço.
+# Para textos só ASCII a própria tabela converte para minúsculas.
+_ASCII_TABLE = bytes(c if c in _KEEP else (c + 32 if 65 <= c <= 90 else 32) for c in range(256))
+# Após lower + NFKD, maiúsculas que sobram vêm de decomposições e viram espaço
+_DECOMPOSED_TABLE = bytes(c if c in _KEEP else 32 for c in range(256))
+
+_EMAIL_RE = re.compile(r"\b[\w\.-]+@[\w\.-]+\.\w+\b")
+_CPF_FORMATTED_RE = re.compile(r"\b\d{3}\.\d{3}\.\d{3}-\d{2}\b")
+_CPF_RE = re.compile(r"\b\d{11}\b")
+_LONG_NUMBER_RE = re.compile(r"\b\d{6,}\b")
+
 
 def clean_text(text: str) -> str:
     if not text:
         return ""
     
-    # Converte para minúsculas
-    text = text.lower()
-    
-    # Remove acentos
-    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
-    
-    # Mantém letras, números e espaços
-    text = re.sub(r"[^a-z0-9\s]", " ", text)
+    if text.isascii():
+        # Minúsculas e remoção de símbolos em uma única passada
+        data = text.encode("ASCII").translate(_ASCII_TABLE)
+    else:
+        # Remove acentos e mantém letras e números
+        data = unicodedata.normalize("NFKD", text.lower()).encode("ASCII", "ignore").translate(_DECOMPOSED_TABLE)
     
     # Remove espaços extras
-    text = re.sub(r"\s+", " ", text).strip()
+    return " ".join(data.decode("ASCII").split())
+
+
+def clean_texts(texts: Iterable[str]) -> Iterator[str]:
+    """Versão em lote/streaming de clean_text."""
+    for text in texts:
+        yield clean_text(text)
+
+
+def anonymize_text(text: str) -> str:
+    """Anonimiza dados sensíveis no texto"""
+    if not text:
+        return ""
     
-    return text
\ No newline at end of file
+    # Anonimiza emails
+    text = _EMAIL_RE.sub("[EMAIL]", text)
+    # Anonimiza CPFs
+    text = _CPF_FORMATTED_RE.sub("[CPF]", text)
+    text = _CPF_RE.sub("[CPF]", text)
+    # Anonimiza números longos
+    text = _LONG_NUMBER_RE.sub("[NUMERO]", text)
+    return text
@@ -1,62 +1,44 @@
-import os
+import asyncio
 import logging
-import google.generativeai as genai
+import os
+from typing import AsyncIterator, Optional
 
-from dotenv import load_dotenv
-load_dotenv()
-# Configuração da API do Google
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        # Configuração do modelo
-        generation_config = {
-            "temperature": 0.7,
-            "top_p": 0.95,
-            "top_k": 40,
-            "max_output_tokens": 1024,
-        }
-        
-        safety_settings = [
-            {
-                "category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_HATE_SPEECH",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-        ]
-        
-        model = genai.GenerativeModel(
-            model_name="gemini-pro",
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
-        logging.info("Google AI Gemini configurado com sucesso para respostas")
-    except Exception as e:
-        logging.error(f"Erro ao configurar Google AI: {e}")
-        model = None
-else:
-    model = None
-    logging.warning("GOOGLE_API_KEY não encontrada. Usando respostas padrão.")
+from utils.llm import (CircuitOpenError, GeminiClient, call_llm, call_llm_sync, prompt_key, singleflight, stream_llm,
+                       trim_to_token_budget)
+from utils.cache import response_cache
+from utils.concurrency import run_blocking
+from utils.similarity import similarity_index
+from utils.metrics import LLM_EARLY_TEMPLATES, LLM_FALLBACKS, Callback, timed
 
-def suggest_response(category: str, text: str) -> str:
-    """
-    Gera sugestão de resposta usando Google Gemini API com fallback.
-    """
-    if model is not None:
-        prompt = f"""
+# Se > 0, responde com o template quando o Gemini não respondeu em X ms; a
+# chamada continua em segundo plano e a resposta fica no cache para a próxima vez
+LLM_TEMPLATE_AFTER_MS = float(os.getenv("LLM_TEMPLATE_AFTER_MS", "0"))
+
+# Cliente do Gemini, criado em cada worker no primeiro uso (ou no startup)
+gemini = GeminiClient("respostas")
+
+# Gerações que seguem em segundo plano depois de devolver o template
+_background = set()
+
+def _cache_lookups():
+    for name, stats in (("exato", response_cache.stats()), ("similaridade", similarity_index.stats())):
+        yield (name, "hit"), stats["hits"]
+        yield (name, "miss"), stats["misses"]
+
+def _cache_entries():
+    yield ("exato",), response_cache.stats()["entradas_memoria"]
+    yield ("similaridade",), similarity_index.stats()["entradas"]
+
+Callback("autou_cache_consultas_total", "Consultas aos caches de respostas sugeridas", "counter",
+         ["cache", "resultado"], _cache_lookups)
+Callback("autou_cache_entradas", "Entradas em memória nos caches de respostas sugeridas", "gauge",
+         ["cache"], _cache_entries)
+
+def _build_prompt(category: str, text: str) -> str:
+    # Emails longos (ex.: PDF de muitas páginas) são cortados para LLM_PROMPT_MAX_TOKENS
+    return f"""
         Classificação: {category}
-        Email: {text}
+        Email: {trim_to_token_budget(text)}
         
         Com base na classificação e conteúdo do email acima, sugira uma resposta curta, educada e profissional em português.
         A resposta deve ser direta e adequada ao contexto do email.
@@ -64,14 +46,136 @@ def suggest_response(category: str, text: str) -> str:
         Se for um email produtivo (que requer ação), ofereça ajuda e indique que a equipe irá analisar.
         Se for um email improdutivo (sem necessidade de ação), agradeça de forma cordial.
         """
-        
+
+def default_response(category: str) -> str:
+    """Respostas padrão quando Google AI não disponível"""
+    if category == "Produtivo":
+        return "Olá! Recebemos sua solicitação e nossa equipe irá analisar e retornar o mais breve possível. Obrigado."
+    return "Obrigado pela sua mensagem! No momento nenhuma ação é necessária. Abraços."
+
+def _fallback_response(category: str) -> str:
+    LLM_FALLBACKS.inc(finalidade="respostas")
+    return default_response(category)
+
+def _lookup_stored(category: str, text: str):
+    """Procura uma resposta já gerada: primeiro repetição exata, depois quase-duplicata."""
+    with timed("cache"):
+        cached = response_cache.get(category, text)
+        if cached is not None:
+            return cached
+        similar = similarity_index.lookup(category, text)
+        if similar is not None:
+            # Promove ao cache exato para que repetições futuras sejam ainda mais baratas
+            response_cache.set(category, text, similar)
+        return similar
+
+def _store(category: str, text: str, reply: str):
+    response_cache.set(category, text, reply)
+    similarity_index.add(category, text, reply)
+
+def suggest_response(category: str, text: str) -> str:
+    """
+    Gera sugestão de resposta usando Google Gemini API com fallback.
+    """
+    model = gemini.get()
+    if model is not None:
+        stored = _lookup_stored(category, text)
+        if stored is not None:
+            return stored
+        prompt = _build_prompt(category, text)
+
+        def generate() -> str:
+            response = call_llm_sync(lambda: model.generate_content(prompt), purpose="respostas")
+            reply = response.text.strip()
+            _store(category, text, reply)
+            return reply
+
         try:
-            response = model.generate_content(prompt)
-            return response.text.strip()
+            # Emails idênticos processados ao mesmo tempo compartilham uma única chamada
+            return singleflight.do_sync(prompt_key("respostas", prompt), generate, purpose="respostas")
+        except CircuitOpenError:
+            pass
         except Exception as e:
             logging.error(f"Erro ao chamar Google AI: {e}")
     
-    # Respostas padrão quando Google AI não disponível
-    if category == "Produtivo":
-        return "Olá! Recebemos sua solicitação e nossa equipe irá analisar e retornar o mais breve possível. Obrigado."
-    return "Obrigado pela sua mensagem! No momento nenhuma ação é necessária. Abraços."
\ No newline at end of file
+    return _fallback_response(category)
+
+async def _generate(model, category: str, text: str) -> Optional[str]:
+    """
+    Chama o Gemini e guarda a resposta; None se falhar. Chamadas simultâneas
+    para o mesmo email (ex.: comunicado encaminhado a muitos destinatários)
+    aguardam uma única chamada ao Gemini.
+    """
+    # O corte de textos longos roda no pool de CPU, fora do event loop
+    prompt = await run_blocking(_build_prompt, category, text)
+
+    async def generate() -> str:
+        response = await call_llm(lambda: model.generate_content_async(prompt), purpose="respostas")
+        reply = response.text.strip()
+        await run_blocking(_store, category, text, reply)
+        return reply
+
+    try:
+        return await singleflight.do(prompt_key("respostas", prompt), generate, purpose="respostas")
+    except (asyncio.TimeoutError, CircuitOpenError):
+        pass
+    except Exception as e:
+        logging.error(f"Erro ao chamar Google AI: {e}")
+    return None
+
+async def suggest_response_async(category: str, text: str) -> str:
+    """
+    Versão assíncrona de suggest_response: não bloqueia o event loop e respeita
+    o limite de concorrência, o prazo e o disjuntor das chamadas ao Gemini.
+    """
+    model = gemini.get()
+    if model is not None:
+        stored = await run_blocking(_lookup_stored, category, text)
+        if stored is not None:
+            return stored
+        if LLM_TEMPLATE_AFTER_MS > 0:
+            task = asyncio.ensure_future(_generate(model, category, text))
+            try:
+                reply = await asyncio.wait_for(asyncio.shield(task), LLM_TEMPLATE_AFTER_MS / 1000)
+            except asyncio.TimeoutError:
+                _background.add(task)
+                task.add_done_callback(_background.discard)
+                LLM_EARLY_TEMPLATES.inc(finalidade="respostas")
+                return default_response(category)
+        else:
+            reply = await _generate(model, category, text)
+        if reply is not None:
+            return reply
+    
+    return _fallback_response(category)
+
+async def suggest_response_stream(category: str, text: str) -> AsyncIterator[str]:
+    """
+    Gera a sugestão de resposta em trechos, repassados assim que o Gemini os produz.
+    """
+    model = gemini.get()
+    if model is not None:
+        stored = await run_blocking(_lookup_stored, category, text)
+        if stored is not None:
+            yield stored
+            return
+        prompt = await run_blocking(_build_prompt, category, text)
+        parts = []
+        try:
+            async for part in stream_llm(lambda: model.generate_content_async(prompt, stream=True), purpose="respostas"):
+                parts.append(part)
+                yield part
+        except (asyncio.TimeoutError, CircuitOpenError):
+            pass
+        except Exception as e:
+            logging.error(f"Erro ao chamar Google AI: {e}")
+        else:
+            reply = "".join(parts).strip()
+            if reply:
+                await run_blocking(_store, category, text, reply)
+                return
+        if parts:
+            # Parte da resposta já foi enviada; não mistura com a resposta padrão
+            return
+    
+    yield _fallback_response(category)
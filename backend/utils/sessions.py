@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from utils.storage import ProcessLocalSQLite
+
+# Número máximo de sessões de chat mantidas em memória
+CHAT_SESSION_LIMIT = int(os.getenv("CHAT_SESSION_LIMIT", "1000"))
+# Tempo (segundos) sem uso até a sessão expirar
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "86400"))
+# Banco SQLite que compartilha as sessões entre workers (vazio: apenas memória do worker)
+CHAT_SESSION_PATH = os.getenv("CHAT_SESSION_PATH", os.path.join(tempfile.gettempdir(), "autou-chat-sessions.db"))
+# Número de mensagens (usuário + assistente) mantidas literalmente no histórico
+CHAT_MAX_TURNS = int(os.getenv("CHAT_MAX_TURNS", "10"))
+# Orçamento aproximado de tokens do histórico enviado ao modelo
+CHAT_MAX_TOKENS = int(os.getenv("CHAT_MAX_TOKENS", "2000"))
+# Tamanho máximo do resumo das mensagens antigas
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "1500"))
+
+_SUMMARY_SNIPPET_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    # Aproximação: ~4 caracteres por token
+    return len(text) // 4 + 1
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= _SUMMARY_SNIPPET_CHARS:
+        return text
+    return text[:_SUMMARY_SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+
+
+class ChatSession:
+    """Histórico recente de uma conversa mais um resumo das mensagens antigas."""
+
+    def __init__(self, session_id: str, summary: str = "", turns: Optional[List[Dict]] = None,
+                 updated_at: Optional[float] = None):
+        self.id = session_id
+        self.summary = summary
+        self.turns = turns or []
+        self.updated_at = updated_at or time.time()
+
+    def to_history(self) -> List[Dict]:
+        """Histórico no formato do frontend, com o resumo como contexto inicial."""
+        history = []
+        if self.summary:
+            history.append({"role": "user", "content": f"Resumo da conversa até aqui: {self.summary}"})
+            history.append({"role": "assistant", "content": "Entendido, vou considerar esse contexto."})
+        return history + self.turns
+
+    def append(self, message: str, reply: str):
+        self.turns.append({"role": "user", "content": message})
+        self.turns.append({"role": "assistant", "content": reply})
+        self.updated_at = time.time()
+        self._compact()
+
+    def _tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(t["content"]) for t in self.turns)
+
+    def _compact(self):
+        # Move as mensagens mais antigas para o resumo até caber na janela
+        while len(self.turns) > 2 and (len(self.turns) > CHAT_MAX_TURNS or self._tokens() > CHAT_MAX_TOKENS):
+            old = self.turns[:2]
+            del self.turns[:2]
+            entry = "; ".join(
+                f"{'Usuário' if t['role'] == 'user' else 'Assistente'}: {_snippet(t['content'])}" for t in old
+            )
+            summary = f"{self.summary} | {entry}" if self.summary else entry
+            # Mantém apenas a parte mais recente do resumo
+            self.summary = summary[-CHAT_SUMMARY_MAX_CHARS:]
+
+    def to_json(self) -> str:
+        return json.dumps({"summary": self.summary, "turns": self.turns}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, session_id: str, data: str, updated_at: float) -> "ChatSession":
+        payload = json.loads(data)
+        return cls(session_id, payload.get("summary", ""), payload.get("turns", []), updated_at)
+
+
+class SessionStore:
+    """
+    Armazena sessões de chat no servidor. Com SQLite, o banco é a fonte da
+    verdade: toda leitura vai ao banco e cada troca é acrescentada à versão
+    mais recente numa transação, então qualquer worker atende a mesma sessão
+    sem sobrescrever turnos gravados por outro. A LRU em memória só é usada
+    sem banco (ou quando ele falha).
+    """
+
+    def __init__(self, max_sessions: int = CHAT_SESSION_LIMIT, ttl: float = CHAT_SESSION_TTL,
+                 path: Optional[str] = CHAT_SESSION_PATH):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                self._db = ProcessLocalSQLite(path, [
+                    "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                    "id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+                ])
+                logging.info(f"Sessões de chat persistidas em {path}")
+            except sqlite3.Error as e:
+                logging.error(f"Erro ao abrir sessões SQLite em {path}: {e}. Usando apenas memória.")
+                self._db = None
+        else:
+            logging.warning("Sessões de chat apenas em memória: com vários workers, "
+                            "mensagens atendidas por outro worker não encontram a sessão")
+
+    def create(self, history: Optional[List[Dict]] = None) -> ChatSession:
+        """Nova sessão, opcionalmente com o histórico reenviado pelo cliente."""
+        turns = [
+            {"role": turn["role"], "content": str(turn["content"])}
+            for turn in history or []
+            if isinstance(turn, dict) and turn.get("role") in ("user", "assistant") and turn.get("content")
+        ]
+        session = ChatSession(uuid.uuid4().hex, turns=turns)
+        session._compact()
+        self.save(session)
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        now = time.time()
+        with self._lock:
+            session = self._memory.get(session_id)
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT data, updated_at FROM chat_sessions WHERE id = ?", (session_id,)
+                    ).fetchone()
+                    # A cópia em memória pode estar desatualizada: vale o que está no banco
+                    session = ChatSession.from_json(session_id, row[0], row[1]) if row is not None else None
+                except sqlite3.Error as e:
+                    logging.error(f"Erro lendo sessão SQLite: {e}")
+            if session is None:
+                self._memory.pop(session_id, None)
+                return None
+            if session.updated_at + self.ttl <= now:
+                self._delete_locked(session_id)
+                return None
+            self._remember_locked(session)
+            return session
+
+    def save(self, session: ChatSession):
+        with self._lock:
+            self._remember_locked(session)
+            if self._db is not None:
+                try:
+                    self._write_locked(self._db.conn, session)
+                except sqlite3.Error as e:
+                    logging.error(f"Erro gravando sessão SQLite: {e}")
+
+    def append_turn(self, session: ChatSession, message: str, reply: str):
+        """
+        Acrescenta a troca à sessão. Com banco, lê a versão gravada e grava a
+        nova na mesma transação: turnos que outro worker gravou depois que esta
+        cópia foi lida entram no resultado em vez de serem perdidos.
+        """
+        with self._lock:
+            if self._db is not None:
+                try:
+                    latest = self._append_db_locked(session, message, reply)
+                    session.summary, session.turns, session.updated_at = latest.summary, latest.turns, latest.updated_at
+                    self._remember_locked(session)
+                    return
+                except sqlite3.Error as e:
+                    logging.error(f"Erro gravando sessão SQLite: {e}")
+            session.append(message, reply)
+            self._remember_locked(session)
+
+    def _append_db_locked(self, session: ChatSession, message: str, reply: str) -> ChatSession:
+        conn = self._db.conn
+        # IMMEDIATE: reserva a escrita antes de ler, serializando workers na mesma sessão
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data, updated_at FROM chat_sessions WHERE id = ?", (session.id,)
+            ).fetchone()
+            if row is not None:
+                latest = ChatSession.from_json(session.id, row[0], row[1])
+            else:
+                latest = ChatSession(session.id, session.summary, list(session.turns), session.updated_at)
+            latest.append(message, reply)
+            self._write_locked(conn, latest)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return latest
+
+    def _write_locked(self, conn: sqlite3.Connection, session: ChatSession):
+        conn.execute(
+            "INSERT OR REPLACE INTO chat_sessions (id, data, updated_at) VALUES (?, ?, ?)",
+            (session.id, session.to_json(), session.updated_at),
+        )
+        conn.execute("DELETE FROM chat_sessions WHERE updated_at <= ?", (time.time() - self.ttl,))
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._delete_locked(session_id)
+
+    def _remember_locked(self, session: ChatSession):
+        self._memory[session.id] = session
+        self._memory.move_to_end(session.id)
+        while len(self._memory) > self.max_sessions:
+            self._memory.popitem(last=False)
+
+    def _delete_locked(self, session_id: str):
+        self._memory.pop(session_id, None)
+        if self._db is not None:
+            try:
+                self._db.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+            except sqlite3.Error as e:
+                logging.error(f"Erro removendo sessão SQLite: {e}")
+
+
+session_store = SessionStore()
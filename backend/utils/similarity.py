@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from utils.preprocessor import clean_text
+from model_registry import registry
+
+# Similaridade de cosseno mínima para reaproveitar uma resposta já gerada
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.9"))
+# Número máximo de emails indexados por categoria
+SIMILARITY_INDEX_SIZE = int(os.getenv("SIMILARITY_INDEX_SIZE", "2000"))
+# Emails novos acumulados antes de reconstruir a matriz do índice (custo amortizado)
+SIMILARITY_MERGE_BATCH = int(os.getenv("SIMILARITY_MERGE_BATCH", "64"))
+
+
+def _vectorize(text: str):
+    """
+    Vetoriza o texto com o vetorizador já treinado do modelo atual.
+    Retorna (versão do modelo, vetor normalizado) ou None.
+    """
+    loaded = registry.current
+    if loaded is None:
+        return None
+    pipeline = loaded.pipeline
+    # Pipeline do scikit-learn: todas as etapas exceto o classificador final;
+    # modelo compacto: o próprio modelo expõe o vetor TF-IDF
+    vectorizer = pipeline[:-1] if hasattr(pipeline, "steps") else pipeline
+    vector = vectorizer.transform([clean_text(text)])
+    if vector.nnz == 0:
+        return None
+    norm = float(vector.multiply(vector).sum()) ** 0.5
+    return loaded.version, vector.multiply(1.0 / norm).tocsr()
+
+
+class _CategoryIndex:
+    """
+    Vetores de uma categoria. A matriz principal só é reconstruída a cada
+    SIMILARITY_MERGE_BATCH inserções: entradas novas ficam num bloco pendente
+    pequeno e as removidas são apenas mascaradas até a próxima reconstrução.
+    """
+
+    def __init__(self):
+        # chave -> (vetor, resposta); a ordem define a remoção LRU
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self.next_key = 0
+        self.matrix = None
+        self.keys: List[int] = []
+        self.rows: Dict[int, int] = {}
+        self.alive = None
+        self.pending: List[int] = []
+        self.pending_matrix = None
+
+    def rebuild(self):
+        from scipy.sparse import vstack
+        import numpy as np
+
+        self.keys = list(self.entries)
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self.matrix = vstack([self.entries[k][0] for k in self.keys]).tocsr() if self.keys else None
+        self.alive = np.ones(len(self.keys), dtype=bool)
+        self.pending = []
+        self.pending_matrix = None
+
+    def add(self, vector, reply, max_size: int, merge_batch: int):
+        key = self.next_key
+        self.next_key += 1
+        self.entries[key] = (vector, reply)
+        self.pending.append(key)
+        self.pending_matrix = None
+        while len(self.entries) > max_size:
+            evicted, _ = self.entries.popitem(last=False)
+            row = self.rows.pop(evicted, None)
+            if row is not None:
+                self.alive[row] = False
+            else:
+                self.pending.remove(evicted)
+        if len(self.pending) >= merge_batch:
+            self.rebuild()
+
+    def best(self, vector):
+        """(chave, similaridade) da entrada mais parecida, ou None."""
+        from scipy.sparse import vstack
+
+        best_key, best_score = None, -1.0
+        if self.matrix is not None and self.rows:
+            # Similaridade de cosseno como produto de matrizes esparsas
+            scores = (self.matrix @ vector.T).toarray().ravel()
+            scores[~self.alive] = -1.0
+            row = int(scores.argmax())
+            if scores[row] > best_score:
+                best_key, best_score = self.keys[row], float(scores[row])
+        if self.pending:
+            if self.pending_matrix is None:
+                self.pending_matrix = vstack([self.entries[k][0] for k in self.pending]).tocsr()
+            scores = (self.pending_matrix @ vector.T).toarray().ravel()
+            row = int(scores.argmax())
+            if scores[row] > best_score:
+                best_key, best_score = self.pending[row], float(scores[row])
+        return None if best_key is None else (best_key, best_score)
+
+
+class NearDuplicateIndex:
+    """
+    Índice em memória de emails que já receberam resposta gerada. Um email novo
+    da mesma categoria, com similaridade acima do limiar, reaproveita a resposta.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_size: int = SIMILARITY_INDEX_SIZE,
+                 merge_batch: int = SIMILARITY_MERGE_BATCH):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.merge_batch = max(1, merge_batch)
+        self._indexes: Dict[str, _CategoryIndex] = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _index_for(self, category: str, version: str) -> _CategoryIndex:
+        # Vetores de versões diferentes do modelo não são comparáveis
+        if version != self._version:
+            self._indexes.clear()
+            self._version = version
+        return self._indexes.setdefault(category, _CategoryIndex())
+
+    def lookup(self, category: str, text: str) -> Optional[str]:
+        if self.max_size <= 0:
+            return None
+        try:
+            vectorized = _vectorize(text)
+        except Exception as e:
+            logging.error(f"Erro ao vetorizar email para busca por similaridade: {e}")
+            return None
+        if vectorized is None:
+            return None
+        version, vector = vectorized
+
+        with self._lock:
+            index = self._index_for(category, version)
+            found = index.best(vector) if index.entries else None
+            if found is None or found[1] < self.threshold:
+                self.misses += 1
+                return None
+
+            key = found[0]
+            index.entries.move_to_end(key)
+            self.hits += 1
+            return index.entries[key][1]
+
+    def add(self, category: str, text: str, reply: str):
+        if self.max_size <= 0:
+            return
+        try:
+            vectorized = _vectorize(text)
+        except Exception as e:
+            logging.error(f"Erro ao vetorizar email para o índice de similaridade: {e}")
+            return
+        if vectorized is None:
+            return
+        version, vector = vectorized
+
+        with self._lock:
+            index = self._index_for(category, version)
+            index.add(vector, reply, self.max_size, self.merge_batch)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entradas": sum(len(index.entries) for index in self._indexes.values()),
+                "limiar": self.threshold,
+            }
+
+
+similarity_index = NearDuplicateIndex()
@@ -0,0 +1,195 @@
+"""
+Servidor dos arquivos estáticos do frontend (frontend/dist) com custo mínimo
+por requisição.
+
+Na inicialização o diretório é lido uma vez e cada arquivo vira uma entrada de
+um índice em memória, com o tipo, o ETag forte (hash do conteúdo) e as
+variantes .br/.gz geradas no build (frontend/scripts/compress.mjs). Arquivos
+pequenos ficam inteiros em memória. Por requisição resta escolher a variante
+pelo Accept-Encoding, responder 304 se o If-None-Match bater e enviar os
+bytes, sem compressão nem stat no disco.
+
+Arquivos com hash no nome (gerados pelo Vite em assets/) recebem
+Cache-Control imutável de um ano; os demais (index.html) são revalidados a
+cada carga pelo ETag.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Tamanho máximo (bytes) de um arquivo estático mantido inteiro em memória
+STATIC_MEMORY_MAX_BYTES = int(os.getenv("STATIC_MEMORY_MAX_BYTES", str(1024 * 1024)))
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+# Variantes pré-comprimidas, em ordem de preferência
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Nome gerado pelo Vite: <nome>-<hash>.<ext> (hash de 8 caracteres base64url)
+_FINGERPRINT_RE = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+_CHUNK_SIZE = 64 * 1024
+
+
+class _Variant:
+    __slots__ = ("path", "size", "etag", "body")
+
+    def __init__(self, path: Path, etag: str, body: bytes, keep_in_memory: bool):
+        self.path = path
+        self.size = len(body)
+        self.etag = etag
+        self.body = body if keep_in_memory else None
+
+
+class _Asset:
+    __slots__ = ("media_type", "cache_control", "variants")
+
+    def __init__(self, media_type: str, cache_control: str, variants: Dict[Optional[str], _Variant]):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        # Codificação (None = original) -> variante
+        self.variants = variants
+
+
+def is_fingerprinted(relative: str) -> bool:
+    # Só o diretório de saída do Vite tem nomes com hash; "public/" é copiado como está
+    return relative.startswith("assets/") and _FINGERPRINT_RE.search(relative) is not None
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    accepted = []
+    for part in header.split(","):
+        name, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.append(name.lower())
+    return accepted
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class PrecompressedStaticFiles:
+    """
+    App ASGI para montar em "/" no lugar do StaticFiles: serve o índice em
+    memória montado no construtor. Com html=True, "/" e diretórios respondem
+    com o index.html e caminhos desconhecidos com o 404.html, se existir.
+    """
+
+    def __init__(self, directory: str, html: bool = False, memory_max_bytes: int = STATIC_MEMORY_MAX_BYTES):
+        self.directory = Path(directory)
+        self.html = html
+        self.memory_max_bytes = memory_max_bytes
+        self.index: Dict[str, _Asset] = {}
+        self.build_index()
+
+    def build_index(self):
+        index = {}
+        total = compressed = 0
+        for path in sorted(self.directory.rglob("*")):
+            if not path.is_file() or path.suffix in (".br", ".gz"):
+                continue
+            relative = path.relative_to(self.directory).as_posix()
+            body = path.read_bytes()
+            digest = hashlib.sha256(body).hexdigest()[:20]
+            keep = len(body) <= self.memory_max_bytes
+            variants = {None: _Variant(path, f'"{digest}"', body, keep)}
+            for encoding, suffix in ENCODINGS:
+                encoded_path = path.with_name(path.name + suffix)
+                if encoded_path.is_file():
+                    encoded = encoded_path.read_bytes()
+                    # O ETag muda com a codificação: caches não misturam as variantes
+                    variants[encoding] = _Variant(encoded_path, f'"{digest}-{encoding}"', encoded, keep)
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+                media_type += "; charset=utf-8"
+            cache_control = IMMUTABLE_CACHE if is_fingerprinted(relative) else REVALIDATE_CACHE
+            index["/" + relative] = _Asset(media_type, cache_control, variants)
+            total += 1
+            compressed += len(variants) > 1
+        self.index = index
+        logging.info(f"Frontend indexado: {total} arquivos ({compressed} com variantes comprimidas) em {self.directory}")
+
+    def _lookup(self, path: str) -> Tuple[Optional[_Asset], int]:
+        asset = self.index.get(path)
+        if asset is None and self.html:
+            asset = self.index.get(path.rstrip("/") + "/index.html")
+        if asset is not None:
+            return asset, 200
+        if self.html and "/404.html" in self.index:
+            return self.index["/404.html"], 404
+        return None, 404
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await self._send_plain(send, 405, b"Method Not Allowed", [(b"allow", b"GET, HEAD")])
+            return
+
+        asset, status = self._lookup(scope["path"])
+        if asset is None:
+            await self._send_plain(send, 404, b"Not Found")
+            return
+
+        request_headers = dict(scope["headers"])
+        accepted = _accepted_encodings(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        encoding = next((name for name, _ in ENCODINGS if name in asset.variants and name in accepted), None)
+        variant = asset.variants[encoding]
+
+        headers = [
+            (b"etag", variant.etag.encode("latin-1")),
+            (b"cache-control", asset.cache_control.encode("latin-1")),
+        ]
+        if len(asset.variants) > 1:
+            headers.append((b"vary", b"Accept-Encoding"))
+
+        if_none_match = request_headers.get(b"if-none-match")
+        if status == 200 and if_none_match and _etag_matches(if_none_match.decode("latin-1"), variant.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers.append((b"content-type", asset.media_type.encode("latin-1")))
+        headers.append((b"content-length", str(variant.size).encode("latin-1")))
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        if method == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+        elif variant.body is not None:
+            await send({"type": "http.response.body", "body": variant.body})
+        else:
+            await self._send_file(send, variant.path)
+
+    async def _send_file(self, send, path: Path):
+        # Arquivos grandes: lidos em blocos numa thread para não bloquear o event loop
+        from starlette.concurrency import run_in_threadpool
+
+        with open(path, "rb") as f:
+            while True:
+                chunk = await run_in_threadpool(f.read, _CHUNK_SIZE)
+                more = len(chunk) == _CHUNK_SIZE
+                await send({"type": "http.response.body", "body": chunk, "more_body": more})
+                if not more:
+                    break
+
+    @staticmethod
+    async def _send_plain(send, status: int, body: bytes, extra: List[Tuple[bytes, bytes]] = ()):
+        headers = [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers + list(extra)})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable
+
+
+def _check_access(path: str):
+    """Levanta sqlite3.OperationalError se o banco não puder ser criado/aberto para escrita."""
+    if path == ":memory:" or path.startswith("file:"):
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    if os.path.exists(path):
+        if not os.access(path, os.R_OK | os.W_OK):
+            raise sqlite3.OperationalError(f"sem permissão de leitura/escrita em {path}")
+    elif not os.path.isdir(directory):
+        raise sqlite3.OperationalError(f"diretório inexistente: {directory}")
+    elif not os.access(directory, os.W_OK | os.X_OK):
+        raise sqlite3.OperationalError(f"sem permissão de escrita em {directory}")
+
+
+class ProcessLocalSQLite:
+    """
+    Conexão SQLite (modo WAL) aberta uma vez por processo, no primeiro uso:
+    criada no import do app (master do gunicorn com preload_app), só abre nos
+    workers. Se o PID mudou, a conexão herdada é descartada sem ser fechada
+    (fechá-la no filho mexeria nos locks e no WAL do processo pai) e reabre.
+    """
+
+    # Conexões herdadas de outro processo: mantidas referenciadas para que o
+    # coletor de lixo não as feche
+    _inherited = []
+
+    def __init__(self, path: str, schema: Iterable[str] = ()):
+        self.path = path
+        self.schema = list(schema)
+        self._conn = None
+        self._pid = None
+        self._open_lock = threading.Lock()
+        # Erros de caminho/permissão aparecem já no construtor, sem abrir o banco
+        _check_access(path)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            with self._open_lock:
+                if self._pid != os.getpid():
+                    self._open()
+        return self._conn
+
+    def _open(self):
+        if self._conn is not None:
+            ProcessLocalSQLite._inherited.append(self._conn)
+            self._conn = None
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in self.schema:
+            conn.execute(statement)
+        self._conn = conn
+        self._pid = os.getpid()
+
+    def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return self.conn.execute(sql, params)
@@ -0,0 +1,94 @@
+"""
+Mede o tempo de importação de backend/app.py com `python -X importtime` e
+confere o orçamento de cold start: tempo total máximo e módulos pesados que
+não podem ser importados antes do primeiro uso.
+
+Uso: python benchmarks/bench_import.py [--budget-ms 1500] [--runs 3] [--output import_time.json]
+Sai com código 1 se o orçamento for excedido.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Dependências que devem ser carregadas sob demanda ou no aquecimento em segundo plano
+LAZY_MODULES = ["fitz", "google.generativeai", "sklearn", "joblib", "scipy", "numpy"]
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def run_importtime() -> dict:
+    env = dict(os.environ, PRELOAD_MODELS="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT / "backend", env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Falha ao importar app:\n{proc.stderr[-2000:]}")
+
+    # Cada linha: tempo próprio | cumulativo | nome indentado pela profundidade.
+    # Os filhos aparecem antes do pai, então a subárvore de "app" são as
+    # linhas imediatamente anteriores com indentação maior.
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(cumulative_us), len(indent)))
+
+    app_index = next(i for i, (name, _, _) in enumerate(entries) if name == "app")
+    _, app_us, app_depth = entries[app_index]
+    children = {}
+    subtree = set()
+    for name, cumulative_us, depth in reversed(entries[:app_index]):
+        if depth <= app_depth:
+            break
+        subtree.add(name)
+        if depth == app_depth + 2:
+            children[name] = cumulative_us
+    return {"app_us": app_us, "children": children, "subtree": subtree}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", default=None, help="arquivo JSON com o relatório")
+    args = parser.parse_args()
+
+    # A primeira execução compila os .pyc; as seguintes medem o cold start real
+    run_importtime()
+    runs = [run_importtime() for _ in range(args.runs)]
+    best = min(runs, key=lambda m: m["app_us"])
+    total_ms = best["app_us"] / 1000
+
+    heaviest = sorted(best["children"].items(), key=lambda item: item[1], reverse=True)[:15]
+    eager = [name for name in LAZY_MODULES if name in best["subtree"]]
+    report = {
+        "app_ms": round(total_ms, 1),
+        "orcamento_ms": args.budget_ms,
+        "importados_antecipadamente": eager,
+        "mais_pesados_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"importação levou {total_ms:.0f} ms (orçamento {args.budget_ms:.0f} ms)")
+    if eager:
+        failures.append(f"módulos pesados importados na inicialização: {', '.join(eager)}")
+    if failures:
+        print("Regressão de cold start: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
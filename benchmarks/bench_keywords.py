@@ -0,0 +1,98 @@
+"""
+Compara o fallback por palavras-chave antigo (laço com `word in text`) com o
+KeywordMatcher, em textos longos como os extraídos de PDFs.
+
+Uso: python benchmarks/bench_keywords.py [--chars 2000000] [--repeat 5]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from utils.preprocessor import clean_text  # noqa: E402
+from utils.keywords import KeywordMatcher, KEYWORDS_PATH  # noqa: E402
+
+LEGACY_KEYWORDS = [
+    "suporte", "problema", "erro", "status", "atualizacao", "atualização",
+    "dúvida", "duvida", "reunião", "reuniao", "contrato", "anexo", "urgente",
+    "processo", "solicitação", "solicitacao", "chamado", "ajuda", "suporte", "cliente",
+    "projeto", "prazo", "entrega", "relatório", "relatorio", "documento", "pagamento",
+    "fatura", "nota fiscal", "orcamento", "orçamento", "proposta", "contrato"
+]
+
+
+def legacy_fallback(text_cleaned: str) -> bool:
+    return any(word in text_cleaned for word in LEGACY_KEYWORDS)
+
+
+def legacy_scan_all(text_cleaned: str) -> list:
+    # O laço antigo para no primeiro acerto; para comparar com o matcher, que
+    # sempre devolve todos os termos, medimos também a varredura completa
+    return [word for word in LEGACY_KEYWORDS if word in text_cleaned]
+
+
+def build_corpus(chars: int, productive: bool) -> str:
+    with open(ROOT / "sample_emails" / "dataset.json", "r", encoding="utf-8") as f:
+        data = json.load(f)
+    filler = " ".join(item["text"] for item in data if not item["label"].lower().startswith("prod"))
+    # Remove palavras-chave do texto de preenchimento para forçar a varredura completa
+    base = clean_text(filler)
+    for word in LEGACY_KEYWORDS:
+        base = base.replace(clean_text(word), "")
+    text = (base + " ") * (chars // max(len(base), 1) + 1)
+    text = text[:chars]
+    if productive:
+        text += " segue a nota fiscal em anexo"
+    return text
+
+
+def timeit(func, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    matcher = KeywordMatcher.from_file(KEYWORDS_PATH)
+    results = {}
+    for name, productive in [("sem_keyword", False), ("keyword_no_fim", True)]:
+        text = build_corpus(args.chars, productive)
+        legacy = timeit(legacy_fallback, text, args.repeat)
+        legacy_all = timeit(legacy_scan_all, text, args.repeat)
+        matched = timeit(matcher.match, text, args.repeat)
+        results[name] = {
+            "caracteres": len(text),
+            "legado_any_s": round(legacy, 6),
+            "legado_todos_termos_s": round(legacy_all, 6),
+            "matcher_s": round(matched, 6),
+            "termos": matcher.match(text).terms,
+        }
+
+    # Diferenças de semântica: o laço antigo casa substrings dentro de outras palavras
+    results["falsos_positivos_legado"] = {
+        text: {"legado": legacy_fallback(text), "matcher": matcher.match(text).terms}
+        for text in ["o terror do filme", "statusquo", "reprocessou tudo"]
+    }
+    # Plurais: o legado casava por substring; o matcher aceita os plurais regulares
+    results["falsos_negativos_plural"] = {
+        text: {"legado": legacy_fallback(clean_text(text)), "matcher": matcher.match(clean_text(text)).terms}
+        for text in ["erros no sistema", "problemas com os contratos", "segue os documentos anexos",
+                     "reuniões semanais", "pagamentos atrasados"]
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compara o clean_text atual com a implementação anterior (lower + NFKD + ASCII +
+duas passadas de re.sub): confere que a saída é idêntica em um corpus e mede o
+tempo em textos de vários MB.
+
+Uso: python benchmarks/bench_preprocessor.py [--mb 4] [--repeat 5] [--exaustivo]
+"""
+import argparse
+import json
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from utils.preprocessor import clean_text, clean_texts  # noqa: E402
+
+
+def legacy_clean_text(text: str) -> str:
+    if not text:
+        return ""
+    text = text.lower()
+    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
+    text = re.sub(r"[^a-z0-9\s]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def load_corpus() -> list:
+    corpus = []
+    with open(ROOT / "sample_emails" / "dataset.json", "r", encoding="utf-8") as f:
+        corpus.extend(item["text"] for item in json.load(f))
+    for path in sorted((ROOT / "sample_emails").glob("*.txt")):
+        corpus.append(path.read_text(encoding="utf-8"))
+    requests_path = ROOT / "requests.jsonl"
+    if requests_path.exists():
+        with open(requests_path, "r", encoding="utf-8") as f:
+            corpus.extend(json.loads(line)["body"] for line in f if line.strip())
+    # Casos difíceis: todos os caracteres do plano básico, ligaduras, espaços Unicode
+    corpus.append("".join(chr(c) for c in range(0x20000) if not 0xD800 <= c <= 0xDFFF))
+    corpus.extend(["ﬁnal ①②③ Ⅻ", "İSTANBUL ΣΊΣΥΦΟΣ", "a b c\x1cd\x85e", "", "   ", "\t\nÁÉÍÓÚ çãõ\r\n"])
+    return corpus
+
+
+def timeit(func, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--exaustivo", action="store_true",
+                        help="confere também cada code point Unicode isoladamente")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    mismatches = [i for i, (new, old) in enumerate(zip(clean_texts(corpus), map(legacy_clean_text, corpus)))
+                  if new != old]
+    if mismatches:
+        print(f"Saídas diferentes em {len(mismatches)} textos do corpus: {mismatches[:10]}")
+        sys.exit(1)
+
+    if args.exaustivo:
+        bad = [hex(c) for c in range(0x110000) if not 0xD800 <= c <= 0xDFFF
+               and clean_text(f"A{chr(c)}é") != legacy_clean_text(f"A{chr(c)}é")]
+        if bad:
+            print(f"Saídas diferentes para {len(bad)} code points: {bad[:10]}")
+            sys.exit(1)
+
+    sample = " ".join(corpus[:-7]) or "Olá, preciso de uma atualização sobre o processo #123."
+    size = int(args.mb * 1024 * 1024)
+    text = (sample * (size // len(sample) + 1))[:size]
+    legacy = timeit(legacy_clean_text, text, args.repeat)
+    fused = timeit(clean_text, text, args.repeat)
+    print(json.dumps({
+        "textos_conferidos": len(corpus),
+        "caracteres": len(text),
+        "legado_s": round(legacy, 6),
+        "atual_s": round(fused, 6),
+        "aceleracao": round(legacy / fused, 2),
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Teste de carga dos endpoints /process_text, /upload_file, /chat e /health.
+
+Reproduz corpora reais (requests.jsonl, sample_emails/dataset.json e PDFs
+gerados) com concorrência configurável e mede vazão e latências p50/p95/p99.
+Sem --url, o app roda no mesmo processo (httpx + ASGI) com o Gemini
+substituído pelo stub local (utils/llm_stub.py). Com --url, o alvo é um
+servidor já em execução; para usar o stub nele, inicie-o com LLM_BACKEND=stub.
+
+Uso:
+  python benchmarks/load_test.py [--requests 200] [--concurrency 16]
+      [--cenarios process_text,upload_file,chat,health]
+      [--stub-latency-ms 300] [--stub-error-rate 0.05] [--sem-cache]
+      [--url http://localhost:8080] [--output load_test.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ["process_text", "upload_file", "chat", "health"]
+
+
+def load_texts() -> list:
+    """Textos de email: dataset de exemplo + corpos do backlog (requests.jsonl)."""
+    texts = []
+    with open(ROOT / "sample_emails" / "dataset.json", "r", encoding="utf-8") as f:
+        texts.extend(item["text"] for item in json.load(f))
+    for name in ("exemplo_produtivo.txt", "exemplo_improdutivo.txt"):
+        path = ROOT / "sample_emails" / name
+        if path.exists():
+            texts.append(path.read_text(encoding="utf-8"))
+    requests_path = ROOT / "requests.jsonl"
+    if requests_path.exists():
+        with open(requests_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    texts.append(f"{item.get('title', '')}\n\n{item.get('body', '')}")
+    return texts
+
+
+def build_pdfs(texts: list, count: int, pages: int) -> list:
+    """Gera PDFs com várias páginas de texto a partir do corpus."""
+    import fitz
+
+    pdfs = []
+    for i in range(count):
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page()
+            text = texts[(i + p) % len(texts)]
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=9)
+        pdfs.append(doc.tobytes())
+        doc.close()
+    return pdfs
+
+
+def make_request(scenario: str, i: int, texts: list, pdfs: list, session_ids: dict):
+    """Retorna (método, caminho, kwargs do httpx) da i-ésima requisição do cenário."""
+    text = texts[i % len(texts)]
+    if scenario == "process_text":
+        return "POST", "/process_text", {"json": {"text": text}}
+    if scenario == "upload_file":
+        if i % 2 == 0:
+            return "POST", "/upload_file", {"files": {"file": (f"email_{i}.txt", text.encode("utf-8"), "text/plain")}}
+        pdf = pdfs[i % len(pdfs)]
+        return "POST", "/upload_file", {"files": {"file": (f"email_{i}.pdf", pdf, "application/pdf")}}
+    if scenario == "chat":
+        # Cada "usuário" virtual mantém a própria sessão entre mensagens
+        payload = {"message": text[:500], "use_session": True}
+        session_id = session_ids.get(i % 32)
+        if session_id:
+            payload["session_id"] = session_id
+        return "POST", "/chat", {"json": payload}
+    return "GET", "/health", {}
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def fallback_replies() -> set:
+    """Respostas padrão do app: indicam que o LLM falhou ou estava indisponível."""
+    sys.path.insert(0, str(ROOT / "backend"))
+    from chatbot import ERROR_RESPONSE, UNAVAILABLE_RESPONSE
+    from utils.responses import default_response
+
+    return {default_response("Produtivo"), default_response("Improdutivo"), ERROR_RESPONSE, UNAVAILABLE_RESPONSE}
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, total: int, concurrency: int,
+                       texts: list, pdfs: list, fallbacks_set: set) -> dict:
+    latencies = []
+    status_counts = {}
+    errors = 0
+    fallbacks = 0
+    session_ids = {}
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors, fallbacks
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            method, path, kwargs = make_request(scenario, i, texts, pdfs, session_ids)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                elapsed = time.perf_counter() - start
+                status = str(response.status_code)
+                if response.status_code >= 400:
+                    errors += 1
+                elif scenario != "health":
+                    body = response.json()
+                    if body.get("resposta") in fallbacks_set:
+                        fallbacks += 1
+                    if scenario == "chat":
+                        session_ids.setdefault(i % 32, body.get("session_id"))
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                status = type(e).__name__
+                errors += 1
+            latencies.append(elapsed * 1000)
+            status_counts[status] = status_counts.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requisicoes": len(latencies),
+        "erros": errors,
+        "respostas_padrao": fallbacks,
+        "status": status_counts,
+        "duracao_s": round(duration, 3),
+        "vazao_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latencia_ms": {
+            "media": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Servidor não ficou pronto a tempo")
+
+
+async def run(args, scenarios: list) -> dict:
+    texts = load_texts()
+    pdfs = build_pdfs(texts, args.pdfs, args.pdf_pages) if "upload_file" in scenarios else []
+    timeout = httpx.Timeout(args.timeout)
+    fallbacks_set = fallback_replies()
+    results = {}
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            await wait_ready(client)
+            for scenario in scenarios:
+                results[scenario] = await run_scenario(client, scenario, args.requests, args.concurrency,
+                                                       texts, pdfs, fallbacks_set)
+        return results
+
+    # Modo local: o app é importado depois de configurar o stub via variáveis de ambiente
+    from app import create_app
+
+    app = create_app()
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+            await wait_ready(client)
+            for scenario in scenarios:
+                results[scenario] = await run_scenario(client, scenario, args.requests, args.concurrency,
+                                                       texts, pdfs, fallbacks_set)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="servidor alvo; sem ele o app roda no próprio processo")
+    parser.add_argument("--cenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="requisições por cenário")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--pdfs", type=int, default=8, help="quantidade de PDFs distintos gerados")
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--stub-latency-ms", type=float, default=300)
+    parser.add_argument("--stub-jitter-ms", type=float, default=100)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--sem-cache", action="store_true",
+                        help="desativa o cache de respostas para medir sempre a chamada ao LLM")
+    parser.add_argument("--output", default=None, help="arquivo JSON com o relatório")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.cenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    if not args.url:
+        os.environ["LLM_BACKEND"] = "stub"
+        os.environ["LLM_STUB_LATENCY_MS"] = str(args.stub_latency_ms)
+        os.environ["LLM_STUB_JITTER_MS"] = str(args.stub_jitter_ms)
+        os.environ["LLM_STUB_ERROR_RATE"] = str(args.stub_error_rate)
+        os.environ.setdefault("LLM_MAX_CONCURRENCY", str(args.concurrency))
+        if args.sem_cache:
+            os.environ["RESPONSE_CACHE_SIZE"] = "0"
+            os.environ["RESPONSE_CACHE_PATH"] = ""
+            os.environ["SIMILARITY_INDEX_SIZE"] = "0"
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = asyncio.run(run(args, scenarios))
+    report = {
+        "commit": git_commit(),
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "alvo": args.url or "local (ASGI)",
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "stub_latency_ms": None if args.url else args.stub_latency_ms,
+            "stub_jitter_ms": None if args.url else args.stub_jitter_ms,
+            "stub_error_rate": None if args.url else args.stub_error_rate,
+            "cache": not args.sem_cache,
+        },
+        "cenarios": results,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+// Gera variantes .br e .gz dos arquivos de dist/ depois do `vite build`.
+// O backend (backend/utils/static.py) serve essas variantes prontas conforme
+// o Accept-Encoding, sem comprimir nada durante as requisições.
+import { readdir, readFile, stat, writeFile } from 'node:fs/promises';
+import { join, extname } from 'node:path';
+import { brotliCompressSync, gzipSync, constants } from 'node:zlib';
+
+const DIST = new URL('../dist/', import.meta.url).pathname;
+const COMPRESSIBLE = new Set(['.html', '.js', '.mjs', '.css', '.svg', '.json', '.txt', '.map', '.xml', '.webmanifest', '.ico']);
+// Arquivos menores que isso cabem num pacote: comprimir não compensa
+const MIN_SIZE = 1024;
+
+async function* walk(dir) {
+  for (const entry of await readdir(dir, { withFileTypes: true })) {
+    const path = join(dir, entry.name);
+    if (entry.isDirectory()) yield* walk(path);
+    else yield path;
+  }
+}
+
+let files = 0;
+let original = 0;
+let brotli = 0;
+for await (const path of walk(DIST)) {
+  if (!COMPRESSIBLE.has(extname(path)) || (await stat(path)).size < MIN_SIZE) continue;
+  const data = await readFile(path);
+  const variants = [
+    ['.br', brotliCompressSync(data, {
+      params: {
+        [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+        [constants.BROTLI_PARAM_SIZE_HINT]: data.length,
+      },
+    })],
+    ['.gz', gzipSync(data, { level: constants.Z_BEST_COMPRESSION })],
+  ];
+  for (const [suffix, compressed] of variants) {
+    // Só grava a variante se ela for realmente menor que o original
+    if (compressed.length < data.length) await writeFile(path + suffix, compressed);
+  }
+  files += 1;
+  original += data.length;
+  brotli += Math.min(variants[0][1].length, data.length);
+}
+
+console.log(`compress: ${files} arquivos, ${(original / 1024).toFixed(1)} KiB -> ${(brotli / 1024).toFixed(1)} KiB (br)`);
@@ -21,6 +21,7 @@ function App() {
   const [chatActive, setChatActive] = useState(false);
   const [chatMessage, setChatMessage] = useState("");
   const [chatHistory, setChatHistory] = useState<ChatMessage[]>([]);
+  const [chatSessionId, setChatSessionId] = useState<string | null>(null);
   const [chatLoading, setChatLoading] = useState(false);
   const chatMessagesEndRef = useRef<HTMLDivElement>(null);
 
@@ -97,16 +98,26 @@ function App() {
     const newHistory = [...chatHistory, { role: "user", content: userMessage }];
     setChatHistory(newHistory);
 
-    try {
-      const response = await fetch(`${API_URL}/chat`, {
+    // O histórico fica no servidor; enviamos apenas a mensagem e a sessão
+    const sendChat = (sessionId: string | null, history?: ChatMessage[]) =>
+      fetch(`${API_URL}/chat`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ 
-          message: userMessage, 
-          history: newHistory 
+        body: JSON.stringify({
+          message: userMessage,
+          session_id: sessionId,
+          use_session: true,
+          ...(history ? { history } : {}),
         }),
       });
 
+    try {
+      let response = await sendChat(chatSessionId);
+      if (response.status === 404 && chatSessionId) {
+        // Sessão expirada no servidor: recria a partir do histórico local
+        response = await sendChat(chatSessionId, chatHistory);
+      }
+
       if (!response.ok) {
         throw new Error("Erro na requisição do chat");
       }
@@ -114,7 +125,8 @@ function App() {
       const data = await response.json();
       
       // Atualiza o histórico com a resposta do assistente
-      setChatHistory(data.history || newHistory);
+      setChatSessionId(data.session_id || null);
+      setChatHistory([...newHistory, { role: "assistant", content: data.resposta }]);
     } catch (err: any) {
       alert("Erro no chat: " + (err.message || err));
       // Reverte a mensagem do usuário em caso de erro
@@ -126,6 +138,10 @@ function App() {
   };
 
   const clearChat = () => {
+    if (chatSessionId) {
+      fetch(`${API_URL}/chat/${chatSessionId}`, { method: "DELETE" }).catch(() => {});
+    }
+    setChatSessionId(null);
     setChatHistory([]);
   };
 
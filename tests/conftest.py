@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# Mesmo esquema de imports do backend (from utils.x import ...) e dos scripts de treino
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "training"))
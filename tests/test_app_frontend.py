@@ -0,0 +1,31 @@
+import pytest
+from starlette.testclient import TestClient
+
+import app as app_module
+
+
+@pytest.fixture
+def dist(tmp_path):
+    (tmp_path / "index.html").write_bytes(b"<html>app</html>")
+    return tmp_path
+
+
+def test_root_serves_the_frontend_index(dist, monkeypatch):
+    monkeypatch.setattr(app_module, "FRONTEND_DIST", dist)
+    client = TestClient(app_module.create_app())
+
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.content == b"<html>app</html>"
+    assert client.get("/", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    # As rotas da API continuam antes do frontend
+    assert client.get("/api").json()["message"] == "AutoU Email Classifier API"
+    assert client.get("/health").json() == {"status": "ok"}
+
+
+def test_root_describes_the_api_without_a_frontend_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "FRONTEND_DIST", tmp_path / "inexistente")
+    client = TestClient(app_module.create_app())
+
+    assert client.get("/").json()["message"] == "AutoU Email Classifier API"
@@ -0,0 +1,63 @@
+import pytest
+
+from utils import cache
+from utils.cache import ResponseCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    return clock
+
+
+def test_hit_after_set_and_stats(clock):
+    responses = ResponseCache(max_size=4, ttl=60, path=None)
+    assert responses.get("Produtivo", "Olá") is None
+    responses.set("Produtivo", "Olá", "resposta")
+    # A chave usa o texto normalizado
+    assert responses.get("Produtivo", "  olá ") == "resposta"
+    assert responses.get("Improdutivo", "Olá") is None
+    stats = responses.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_entries_expire_after_ttl(clock):
+    responses = ResponseCache(max_size=4, ttl=60, path=None)
+    responses.set("Produtivo", "texto", "resposta")
+    clock.now += 59
+    assert responses.get("Produtivo", "texto") == "resposta"
+    clock.now += 1
+    assert responses.get("Produtivo", "texto") is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    responses = ResponseCache(max_size=2, ttl=60, path=None)
+    responses.set("Produtivo", "a", "1")
+    responses.set("Produtivo", "b", "2")
+    responses.get("Produtivo", "a")
+    responses.set("Produtivo", "c", "3")
+    assert responses.get("Produtivo", "b") is None
+    assert responses.get("Produtivo", "a") == "1"
+    assert responses.get("Produtivo", "c") == "3"
+
+
+def test_disk_entries_are_shared_and_keep_their_expiry(clock, tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(max_size=4, ttl=60, path=path).set("Produtivo", "texto", "resposta")
+
+    # Outro processo/worker: memória vazia, o valor vem do SQLite
+    other = ResponseCache(max_size=4, ttl=60, path=path)
+    clock.now += 30
+    assert other.get("Produtivo", "texto") == "resposta"
+    # A promoção para a memória não renova o TTL
+    clock.now += 30
+    assert other.get("Produtivo", "texto") is None
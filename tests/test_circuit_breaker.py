@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from utils import llm
+from utils.llm import CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm.time, "monotonic", clock)
+    return clock
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failures=3, reset_after=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow() == (True, False)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() == (False, False)
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failures=2, reset_after=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(failures=1, reset_after=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow() == (True, True)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Enquanto a chamada de teste não termina, as demais são recusadas
+    assert breaker.allow() == (False, False)
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() == (True, False)
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failures=1, reset_after=30)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() == (False, False)
+
+
+def test_released_probe_lets_the_next_call_probe(clock):
+    breaker = CircuitBreaker(failures=1, reset_after=30)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow() == (True, True)
+
+
+def test_disabled_breaker_always_allows():
+    breaker = CircuitBreaker(failures=0)
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.allow() == (True, False)
+
+
+@pytest.fixture
+def fresh_breaker(monkeypatch):
+    breaker = CircuitBreaker(failures=1, reset_after=30)
+    monkeypatch.setattr(llm, "breaker", breaker)
+    return breaker
+
+
+def test_sync_call_times_out_and_counts_as_failure(fresh_breaker):
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        llm.call_llm_sync(lambda: time.sleep(1), timeout=0.05, purpose="teste")
+    assert time.monotonic() - start < 0.5
+    assert fresh_breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        llm.call_llm_sync(lambda: "ok", purpose="teste")
+
+
+def test_sync_call_returns_the_result(fresh_breaker):
+    assert llm.call_llm_sync(lambda: "ok", purpose="teste") == "ok"
+    assert fresh_breaker.state == CircuitBreaker.CLOSED
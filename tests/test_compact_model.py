@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from compact_model import CompactModel
+from export import export_compact, verify_compact
+
+TEXTS = [
+    "preciso de suporte com o erro no sistema",
+    "segue o contrato em anexo para assinatura",
+    "qual o status do chamado aberto ontem",
+    "a nota fiscal do pagamento esta atrasada",
+    "feliz natal a toda a equipe",
+    "obrigado pelo cafe de hoje",
+    "parabens pelo aniversario",
+    "bom fim de semana a todos",
+]
+LABELS = [1, 1, 1, 1, 0, 0, 0, 0]
+UNSEEN = ["erro no contrato do cliente", "feliz aniversario", "", "palavras fora do vocabulario"]
+
+
+def _pipeline(**tfidf_params):
+    pipeline = Pipeline([("tfidf", TfidfVectorizer(**tfidf_params)), ("clf", LogisticRegression())])
+    return pipeline.fit(TEXTS, LABELS)
+
+
+@pytest.mark.parametrize("tfidf_params", [
+    {},
+    {"ngram_range": (1, 2), "sublinear_tf": True},
+    {"stop_words": ["o", "a", "de", "do"], "min_df": 1, "norm": "l1"},
+    {"binary": True, "use_idf": False},
+])
+def test_predict_proba_matches_sklearn(tmp_path, tfidf_params):
+    pipeline = _pipeline(**tfidf_params)
+    target = export_compact(pipeline, tmp_path)
+    compact = CompactModel(target)
+
+    texts = TEXTS + UNSEEN
+    np.testing.assert_allclose(compact.predict_proba(texts), pipeline.predict_proba(texts), atol=1e-9)
+    assert list(compact.predict(texts)) == list(pipeline.predict(texts))
+    assert verify_compact(pipeline, target, texts) <= 1e-9
+
+
+def test_export_updates_current_pointer(tmp_path):
+    target = export_compact(_pipeline(), tmp_path)
+    assert (tmp_path / "current.json").read_text() == f'{{"version": "{target.name}"}}'
+
+
+
+
+def test_reexport_does_not_rewrite_live_files(tmp_path):
+    pipeline = _pipeline()
+    target = export_compact(pipeline, tmp_path)
+    compact = CompactModel(target)
+    before = {name: (target / name).stat() for name in ("idf.npy", "coef.npy", "meta.json")}
+
+    assert export_compact(pipeline, tmp_path) == target
+    for name, stat in before.items():
+        after = (target / name).stat()
+        assert (after.st_ino, after.st_mtime_ns) == (stat.st_ino, stat.st_mtime_ns)
+    # O modelo já carregado (arquivos mapeados em memória) continua funcionando
+    np.testing.assert_allclose(compact.predict_proba(TEXTS), pipeline.predict_proba(TEXTS), atol=1e-9)
+    assert not [path for path in tmp_path.iterdir() if path.name.endswith(".tmp")]
+
+
+def test_interrupted_export_is_replaced(tmp_path):
+    pipeline = _pipeline()
+    target = export_compact(pipeline, tmp_path, publish=False)
+    (target / "meta.json").unlink()
+    (target / "coef.npy").write_bytes(b"parcial")
+
+    assert export_compact(pipeline, tmp_path) == target
+    compact = CompactModel(target)
+    np.testing.assert_allclose(compact.predict_proba(TEXTS), pipeline.predict_proba(TEXTS), atol=1e-9)
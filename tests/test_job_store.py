@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from utils import job_store as job_store_module
+from utils.job_store import DONE, FAILED, QUEUED, RUNNING, JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"), ttl=60)
+
+
+def test_create_and_get(store):
+    job = store.create("caixa.mbox", with_response=True)
+    assert job["status"] == QUEUED
+    assert job["arquivo"] == "caixa.mbox"
+    assert job["sugerir_resposta"] is True
+    assert (job["processados"], job["erros"], job["total"]) == (0, 0, None)
+    assert store.get("inexistente") is None
+
+
+def test_database_is_opened_lazily(tmp_path):
+    path = tmp_path / "jobs.db"
+    store = JobStore(str(path))
+    assert store.available
+    assert not path.exists()
+    store.create("a.eml", with_response=False)
+    assert path.exists()
+
+
+def test_results_are_paged_in_order(store):
+    job_id = store.create("caixa.mbox", with_response=False)["id"]
+    store.set_status(job_id, RUNNING, total=5)
+    assert store.add_results(job_id, [(i, {"n": i}) for i in (3, 4)])
+    assert store.add_results(job_id, [(i, {"n": i}) for i in (0, 1, 2)], errors=1)
+
+    job = store.get(job_id)
+    assert (job["status"], job["processados"], job["erros"], job["total"]) == (RUNNING, 5, 1, 5)
+    assert [r["n"] for r in store.iter_results(job_id, page_size=2)] == [0, 1, 2, 3, 4]
+    assert [r["n"] for r in store.iter_results(job_id, offset=1, limit=3, page_size=2)] == [1, 2, 3]
+
+
+def test_results_for_deleted_job_are_dropped(store):
+    job_id = store.create("caixa.mbox", with_response=False)["id"]
+    store.delete(job_id)
+    assert store.add_results(job_id, [(0, {"n": 0})]) is False
+    assert list(store.iter_results(job_id)) == []
+
+
+def test_orphaned_jobs_are_failed(store, monkeypatch):
+    job_id = store.create("caixa.mbox", with_response=False)["id"]
+    monkeypatch.setattr(job_store_module, "_pid_alive", lambda pid: pid != os.getpid())
+    store.fail_orphans()
+    job = store.get(job_id)
+    assert job["status"] == FAILED
+    assert job["erro"]
+
+
+def test_finished_jobs_expire(store, monkeypatch):
+    job_id = store.create("caixa.mbox", with_response=False)["id"]
+    store.add_results(job_id, [(0, {"n": 0})])
+    store.set_status(job_id, DONE)
+    now = job_store_module.time.time()
+    monkeypatch.setattr(job_store_module.time, "time", lambda: now + 61)
+    store.purge_expired()
+    assert store.get(job_id) is None
+    assert list(store.iter_results(job_id)) == []
+
+
+def test_unusable_path_disables_the_store(tmp_path):
+    assert not JobStore(str(tmp_path / "inexistente" / "jobs.db")).available
@@ -0,0 +1,49 @@
+import pytest
+
+from utils.keywords import KeywordMatcher
+from utils.preprocessor import clean_text
+
+WEIGHTS = {"erro": 1.0, "reunião": 1.0, "contrato": 1.0, "urgente": 2.0, "nota fiscal": 1.5, "status": 1.0}
+
+
+@pytest.fixture
+def matcher():
+    return KeywordMatcher(WEIGHTS)
+
+
+def match(matcher, text):
+    return matcher.match(clean_text(text))
+
+
+def test_accents_and_case_are_normalized(matcher):
+    assert match(matcher, "REUNIÃO amanhã").terms == ["reuniao"]
+
+
+def test_weights_are_summed_and_terms_sorted_by_weight(matcher):
+    result = match(matcher, "Erro urgente no contrato")
+    assert result.score == 4.0
+    assert result.terms == ["urgente", "contrato", "erro"]
+
+
+@pytest.mark.parametrize("text, term", [
+    ("erros no sistema", "erro"),
+    ("problemas com os contratos", "contrato"),
+    ("reuniões semanais", "reuniao"),
+    ("segue as notas fiscais", "nota fiscal"),
+])
+def test_plural_forms_match_the_singular_term(matcher, text, term):
+    assert match(matcher, text).terms == [term]
+
+
+@pytest.mark.parametrize("text", ["o terror do filme", "statusquo", "nota sobre o fiscal"])
+def test_only_whole_words_and_contiguous_phrases_match(matcher, text):
+    assert match(matcher, text).score == 0.0
+
+
+def test_empty_text(matcher):
+    assert match(matcher, "") == (0.0, [])
+
+
+def test_missing_file_falls_back_to_default_keywords(tmp_path):
+    fallback = KeywordMatcher.from_file(str(tmp_path / "inexistente.json"))
+    assert fallback.match("preciso de suporte").terms == ["suporte"]
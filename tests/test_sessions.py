@@ -0,0 +1,62 @@
+import pytest
+
+from utils import sessions
+from utils.sessions import SessionStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def contents(session):
+    return [turn["content"] for turn in session.turns]
+
+
+def test_workers_alternating_turns_do_not_lose_messages(db_path):
+    # Dois workers com a mesma sessão em memória, gravando trocas alternadas
+    first, second = SessionStore(path=db_path), SessionStore(path=db_path)
+    session_id = first.create().id
+
+    for number, store in enumerate([first, second, first], start=1):
+        session = store.get(session_id)
+        store.append_turn(session, f"m{number}", f"r{number}")
+        assert contents(session)[-2:] == [f"m{number}", f"r{number}"]
+
+    assert contents(second.get(session_id)) == ["m1", "r1", "m2", "r2", "m3", "r3"]
+
+
+def test_stale_copy_is_merged_with_the_latest_turns(db_path):
+    first, second = SessionStore(path=db_path), SessionStore(path=db_path)
+    session_id = first.create().id
+    stale = first.get(session_id)
+    second.append_turn(second.get(session_id), "m1", "r1")
+
+    # A cópia lida antes da troca do outro worker não sobrescreve essa troca
+    first.append_turn(stale, "m2", "r2")
+    assert contents(stale) == ["m1", "r1", "m2", "r2"]
+    assert contents(second.get(session_id)) == ["m1", "r1", "m2", "r2"]
+
+
+def test_delete_is_seen_by_other_workers(db_path):
+    first, second = SessionStore(path=db_path), SessionStore(path=db_path)
+    session_id = first.create().id
+    assert second.get(session_id) is not None
+    first.delete(session_id)
+    assert second.get(session_id) is None
+
+
+def test_expired_sessions_are_not_returned(db_path, monkeypatch):
+    store = SessionStore(ttl=60, path=db_path)
+    session_id = store.create([{"role": "user", "content": "oi"}]).id
+    now = sessions.time.time()
+    monkeypatch.setattr(sessions.time, "time", lambda: now + 61)
+    assert store.get(session_id) is None
+
+
+def test_memory_only_store(monkeypatch):
+    store = SessionStore(path=None)
+    session = store.create([{"role": "user", "content": "oi"}, {"role": "system", "content": "x"}])
+    store.append_turn(session, "m1", "r1")
+    assert contents(store.get(session.id)) == ["oi", "m1", "r1"]
+    assert store.get("inexistente") is None
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils import llm
+from utils.llm import SingleFlight
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self.changed = threading.Condition()
+
+    def inc(self, **labels):
+        with self.changed:
+            self.value += 1
+            self.changed.notify_all()
+
+
+@pytest.fixture
+def coalesced(monkeypatch):
+    counter = Counter()
+    monkeypatch.setattr(llm, "LLM_COALESCED", counter)
+    return counter
+
+
+def test_concurrent_sync_calls_share_one_execution(coalesced):
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "resposta"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do_sync("k", slow))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Libera a primeira chamada só depois que as outras três passaram a aguardá-la
+    with coalesced.changed:
+        assert coalesced.changed.wait_for(lambda: coalesced.value == 3, timeout=5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["resposta"] * 4
+    assert len(calls) == 1
+    # Depois de terminar, a chave é liberada: nova chamada executa de novo
+    assert flight.do_sync("k", lambda: "nova") == "nova"
+
+
+def test_sync_error_is_shared_and_key_released():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("falhou")
+
+    with pytest.raises(ValueError):
+        flight.do_sync("k", fail)
+    assert "k" not in flight._calls
+
+
+def test_async_calls_are_coalesced(coalesced):
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "resposta"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", call) for _ in range(5)), flight.do("outra", call))
+
+    assert asyncio.run(main()) == ["resposta"] * 6
+    assert len(calls) == 2
+    assert coalesced.value == 4
+    assert flight._tasks == {}
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.02)
+        return "resposta"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", call))
+        second = asyncio.ensure_future(flight.do("k", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "resposta"
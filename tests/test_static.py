@@ -0,0 +1,89 @@
+import gzip
+
+import pytest
+from starlette.testclient import TestClient
+
+from utils.static import IMMUTABLE_CACHE, REVALIDATE_CACHE, PrecompressedStaticFiles
+
+SCRIPT = b"console.log('ola');" * 50
+
+
+@pytest.fixture
+def dist(tmp_path):
+    (tmp_path / "index.html").write_bytes(b"<html>app</html>")
+    (tmp_path / "404.html").write_bytes(b"<html>404</html>")
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    (assets / "index-AbCd1234.js").write_bytes(SCRIPT)
+    (assets / "index-AbCd1234.js.gz").write_bytes(gzip.compress(SCRIPT))
+    return tmp_path
+
+
+@pytest.fixture
+def client(dist):
+    return TestClient(PrecompressedStaticFiles(str(dist), html=True))
+
+
+def test_index_is_served_with_revalidation(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.content == b"<html>app</html>"
+    assert response.headers["cache-control"] == REVALIDATE_CACHE
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.headers["etag"].startswith('"')
+
+
+def test_matching_etag_returns_304(client):
+    etag = client.get("/").headers["etag"]
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert client.get("/", headers={"If-None-Match": '"outro"'}).status_code == 200
+    assert client.get("/", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+
+def test_fingerprinted_asset_is_immutable_and_precompressed(client):
+    response = client.get("/assets/index-AbCd1234.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE
+    assert response.content == SCRIPT
+
+
+def test_variants_have_distinct_etags(client):
+    plain = client.get("/assets/index-AbCd1234.js", headers={"Accept-Encoding": "identity"})
+    encoded = client.get("/assets/index-AbCd1234.js", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == SCRIPT
+    assert plain.headers["etag"] != encoded.headers["etag"]
+    # O ETag da variante sem compressão não valida a comprimida
+    response = client.get("/assets/index-AbCd1234.js",
+                          headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"]})
+    assert response.status_code == 200
+
+
+def test_rejected_encoding_is_not_used(client):
+    response = client.get("/assets/index-AbCd1234.js", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in response.headers
+
+
+def test_unknown_path_serves_404_page(client):
+    response = client.get("/nao-existe")
+    assert response.status_code == 404
+    assert response.content == b"<html>404</html>"
+
+
+def test_head_and_method_not_allowed(client):
+    head = client.head("/")
+    assert head.status_code == 200
+    assert head.content == b""
+    assert head.headers["content-length"] == str(len(b"<html>app</html>"))
+    assert client.post("/").status_code == 405
+
+
+def test_large_files_are_streamed_from_disk(dist):
+    client = TestClient(PrecompressedStaticFiles(str(dist), html=True, memory_max_bytes=10))
+    response = client.get("/assets/index-AbCd1234.js", headers={"Accept-Encoding": "identity"})
+    assert response.content == SCRIPT
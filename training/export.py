@@ -0,0 +1,44 @@
+"""
+Exporta o pipeline TF-IDF + LogisticRegression para o formato compacto lido por
+backend/compact_model.py (sem scikit-learn na inferência) e confere a paridade
+das probabilidades com o pipeline original.
+
+Uso: python training/export.py [models/model.joblib] [sample_emails/dataset.json]
+"""
+import json
+import logging
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+# O exportador fica no backend, que também o usa ao promover modelos atualizados com feedback
+import compact_model  # noqa: E402
+from compact_model import verify_compact  # noqa: E402,F401
+
+COMPACT_DIR = ROOT / "models" / "compact"
+
+
+def export_compact(pipeline, out_dir=COMPACT_DIR, publish: bool = True) -> Path:
+    return compact_model.export_compact(pipeline, out_dir, publish)
+
+
+def clear_compact(out_dir=COMPACT_DIR) -> bool:
+    return compact_model.clear_compact(out_dir)
+
+
+if __name__ == "__main__":
+    import joblib
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    model_path = sys.argv[1] if len(sys.argv) > 1 else str(ROOT / "models" / "model.joblib")
+    dataset_path = sys.argv[2] if len(sys.argv) > 2 else str(ROOT / "sample_emails" / "dataset.json")
+
+    from utils.preprocessor import clean_text
+
+    pipeline = joblib.load(model_path)
+    target = export_compact(pipeline)
+    with open(dataset_path, "r", encoding="utf-8") as f:
+        samples = [clean_text(item.get("text", "")) for item in json.load(f)]
+    verify_compact(pipeline, target, samples)
@@ -0,0 +1,26 @@
+import os
+import tempfile
+from pathlib import Path
+
+import joblib
+
+
+def save_model_atomic(pipeline, path="models/model.joblib"):
+    """
+    Salva o modelo em um arquivo temporário e o renomeia para o destino.
+    O backend observa o arquivo e nunca deve enxergar uma escrita parcial.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            joblib.dump(pipeline, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# A anonimização fica no backend, que a aplica também às correções recebidas em /feedback
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from utils.preprocessor import anonymize_text  # noqa: E402,F401
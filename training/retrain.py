@@ -1,5 +1,3 @@
-import re
-import joblib
 import json
 import logging
 from pathlib import Path
@@ -12,6 +10,10 @@ import nltk
 from nltk.corpus import stopwords
 import pandas as pd
 
+from model_io import save_model_atomic
+from preprocessing import anonymize_text
+from export import export_compact, verify_compact
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
@@ -24,20 +26,6 @@ def ensure_nltk_data():
     except LookupError:
         nltk.download('stopwords')
 
-def anonymize_text(text: str) -> str:
-    """Anonimiza dados sensíveis no texto"""
-    if not text:
-        return ""
-    
-    # Anonimiza emails
-    text = re.sub(r"\b[\w\.-]+@[\w\.-]+\.\w+\b", "[EMAIL]", text)
-    # Anonimiza CPFs
-    text = re.sub(r"\b\d{3}\.\d{3}\.\d{3}-\d{2}\b", "[CPF]", text)
-    text = re.sub(r"\b\d{11}\b", "[CPF]", text)
-    # Anonimiza números longos
-    text = re.sub(r"\b\d{6,}\b", "[NUMERO]", text)
-    return text
-
 def load_dataset(path="sample_emails/dataset.json"):
     """Carrega e prepara o dataset"""
     p = Path(path)
@@ -84,14 +72,35 @@ def augment_dataset(texts, labels):
     
     return augmented_texts, augmented_labels
 
-def train_and_evaluate():
-    """Treina e avalia o modelo"""
-    ensure_nltk_data()
-    
-    X, y = load_dataset()
+# Configuração padrão; training/search.py avalia alternativas
+VECTORIZER_PARAMS = {
+    "max_features": 3000,
+    "ngram_range": (1, 2),  # Inclui bigramas
+    "min_df": 2,            # Ignora termos muito raros
+    "max_df": 0.8,          # Ignora termos muito comuns
+}
+CLASSIFIER_PARAMS = {
+    "C": 0.1,
+    "class_weight": "balanced",
+}
+
+def get_stop_words():
+    """Stopwords em português e inglês"""
+    pt_stop = stopwords.words("portuguese")
+    en_stop = stopwords.words("english")
+    return sorted(set(pt_stop + en_stop))
+
+def build_vectorizer(**params):
+    return TfidfVectorizer(stop_words=get_stop_words(), **{**VECTORIZER_PARAMS, **params})
+
+def build_classifier(**params):
+    return LogisticRegression(max_iter=1000, random_state=42, **{**CLASSIFIER_PARAMS, **params})
+
+def prepare_splits(path="sample_emails/dataset.json"):
+    """Carrega, aumenta e divide o dataset em treino/validação/teste (70/15/15)"""
+    X, y = load_dataset(path)
     if not X:
-        logging.error("Nenhum dado para treinar. Verifique o dataset.")
-        return
+        return None
     
     # Aumenta o dataset
     X, y = augment_dataset(X, y)
@@ -106,27 +115,22 @@ def train_and_evaluate():
     )
     
     logging.info(f"Treino: {len(X_train)}, Val: {len(X_val)}, Teste: {len(X_test)}")
+    return X_train, X_val, X_test, y_train, y_val, y_test
+
+def train_and_evaluate(vectorizer_params=None, classifier_params=None, dataset="sample_emails/dataset.json"):
+    """Treina e avalia o modelo"""
+    ensure_nltk_data()
     
-    # Stopwords em português e inglês
-    pt_stop = stopwords.words("portuguese")
-    en_stop = stopwords.words("english")
-    stop_words = list(set(pt_stop + en_stop))
+    splits = prepare_splits(dataset)
+    if splits is None:
+        logging.error("Nenhum dado para treinar. Verifique o dataset.")
+        return
+    X_train, X_val, X_test, y_train, y_val, y_test = splits
     
     # Pipeline de classificação
     pipeline = Pipeline([
-        ("tfidf", TfidfVectorizer(
-            max_features=3000, 
-            stop_words=stop_words,
-            ngram_range=(1, 2),  # Inclui bigramas
-            min_df=2,            # Ignora termos muito raros
-            max_df=0.8           # Ignora termos muito comuns
-        )),
-        ("clf", LogisticRegression(
-            max_iter=1000, 
-            class_weight="balanced",
-            random_state=42,
-            C=0.1
-        ))
+        ("tfidf", build_vectorizer(**(vectorizer_params or {}))),
+        ("clf", build_classifier(**(classifier_params or {}))),
     ])
     
     # Treinamento
@@ -143,11 +147,14 @@ def train_and_evaluate():
         report = classification_report(y_data, y_pred, output_dict=True)
         logging.info(f"Relatório de {name}:\n" + json.dumps(report, indent=2, ensure_ascii=False))
     
-    # Salva o modelo
-    Path("models").mkdir(exist_ok=True)
-    joblib.dump(pipeline, "models/model.joblib")
+    # Salva o modelo (escrita atômica: o backend recarrega o arquivo automaticamente)
+    save_model_atomic(pipeline, "models/model.joblib")
     logging.info("Modelo salvo em models/model.joblib")
     
+    # Exporta o formato compacto (inferência sem scikit-learn) e confere a paridade
+    compact_dir = export_compact(pipeline)
+    verify_compact(pipeline, compact_dir, X_val + X_test)
+    
     # Salva as métricas
     Path("metrics").mkdir(exist_ok=True)
     y_pred_test = pipeline.predict(X_test)
@@ -0,0 +1,201 @@
+"""
+Busca de hiperparâmetros do pipeline TF-IDF + LogisticRegression.
+
+As matrizes de features são calculadas uma vez por configuração do
+vetorizador e guardadas em disco (.npz esparso, em --cache-dir); execuções
+seguintes com o mesmo dataset reaproveitam o cache. As configurações do
+classificador são avaliadas em paralelo num pool de processos, que leem as
+matrizes do disco em vez de recebê-las serializadas.
+
+Cada candidato é avaliado na validação (usada na escolha) e no teste, com
+tempos de treino e de inferência. O resultado vai para
+metrics/search_results.json; com --apply o modelo é retreinado com a melhor
+configuração (training/retrain.py).
+
+Uso: python training/search.py [--dataset sample_emails/dataset.json]
+         [--grid grade.json] [--jobs N] [--cache-dir .cache/features] [--apply]
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from sklearn.metrics import accuracy_score, f1_score
+
+from retrain import build_classifier, build_vectorizer, ensure_nltk_data, prepare_splits, train_and_evaluate
+
+# Grade padrão: {parâmetro: [valores]} para o vetorizador e para o classificador
+DEFAULT_GRID = {
+    "vetorizador": {
+        "max_features": [1000, 3000, 5000],
+        "ngram_range": [(1, 1), (1, 2)],
+        "min_df": [1, 2],
+    },
+    "classificador": {
+        "C": [0.01, 0.1, 1.0, 10.0],
+        "class_weight": [None, "balanced"],
+    },
+}
+
+SPLITS = ("train", "val", "test")
+
+
+def expand(grid):
+    """Todas as combinações de uma grade {parâmetro: [valores]}."""
+    names = sorted(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        if "ngram_range" in params:
+            params["ngram_range"] = tuple(params["ngram_range"])
+        yield params
+
+
+def _dataset_digest(splits) -> str:
+    digest = hashlib.sha256()
+    for part in splits:
+        digest.update(json.dumps(list(part), ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cached_features(splits, vectorizer_params, cache_dir: Path, dataset_digest: str) -> Path:
+    """
+    Diretório com as matrizes de treino/validação/teste desta configuração do
+    vetorizador, calculando-as apenas se ainda não estiverem no cache.
+    """
+    key_data = json.dumps({"dataset": dataset_digest, "vetorizador": vectorizer_params}, sort_keys=True, default=list)
+    target = cache_dir / hashlib.sha256(key_data.encode("utf-8")).hexdigest()[:16]
+    if (target / "meta.json").exists():
+        logging.info(f"Features em cache para {vectorizer_params}")
+        return target
+
+    X_train, X_val, X_test, y_train, y_val, y_test = splits
+    start = time.perf_counter()
+    vectorizer = build_vectorizer(**vectorizer_params)
+    matrices = {"train": vectorizer.fit_transform(X_train)}
+    matrices["val"] = vectorizer.transform(X_val)
+    matrices["test"] = vectorizer.transform(X_test)
+    elapsed = time.perf_counter() - start
+
+    # Grava em diretório temporário e renomeia: uma execução interrompida não deixa cache parcial
+    tmp = cache_dir / f".{target.name}.{os.getpid()}.tmp"
+    tmp.mkdir(parents=True, exist_ok=True)
+    for name, labels in zip(SPLITS, (y_train, y_val, y_test)):
+        sparse.save_npz(tmp / f"X_{name}.npz", matrices[name].tocsr())
+        np.save(tmp / f"y_{name}.npy", np.asarray(labels))
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"vetorizador": vectorizer_params, "n_features": matrices["train"].shape[1],
+                   "segundos_vetorizacao": round(elapsed, 4)}, f, default=list)
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Outra execução gravou a mesma configuração primeiro
+        for path in tmp.iterdir():
+            path.unlink()
+        tmp.rmdir()
+    logging.info(f"Features calculadas para {vectorizer_params} em {elapsed:.3f}s")
+    return target
+
+
+def evaluate_candidate(features_dir: str, classifier_params):
+    """Treina e avalia um classificador sobre as matrizes em cache (roda no pool de processos)."""
+    features_dir = Path(features_dir)
+    data = {}
+    for name in SPLITS:
+        data[name] = (sparse.load_npz(features_dir / f"X_{name}.npz"), np.load(features_dir / f"y_{name}.npy"))
+
+    clf = build_classifier(**classifier_params)
+    start = time.perf_counter()
+    clf.fit(*data["train"])
+    fit_seconds = time.perf_counter() - start
+
+    result = {"classificador": classifier_params, "segundos_treino": round(fit_seconds, 4)}
+    inference_seconds = 0.0
+    for name in ("val", "test"):
+        X, y = data[name]
+        start = time.perf_counter()
+        predicted = clf.predict(X)
+        inference_seconds += time.perf_counter() - start
+        result[name] = {
+            "acuracia": accuracy_score(y, predicted),
+            "f1": f1_score(y, predicted, zero_division=0),
+        }
+    examples = data["val"][0].shape[0] + data["test"][0].shape[0]
+    result["ms_inferencia_por_email"] = round(inference_seconds * 1000 / max(examples, 1), 4)
+    return result
+
+
+def search(dataset: str, grid=DEFAULT_GRID, jobs: int = None, cache_dir: str = ".cache/features"):
+    """Avalia a grade e devolve os candidatos ordenados (melhor primeiro)."""
+    ensure_nltk_data()
+    splits = prepare_splits(dataset)
+    if splits is None:
+        raise ValueError(f"Nenhum dado para treinar em {dataset}")
+    digest = _dataset_digest(splits)
+    cache_dir = Path(cache_dir)
+
+    # Uma matriz por configuração do vetorizador; os classificadores a reaproveitam
+    features = [(params, cached_features(splits, params, cache_dir, digest))
+                for params in expand(grid["vetorizador"])]
+    classifiers = list(expand(grid["classificador"]))
+    logging.info(f"Avaliando {len(features) * len(classifiers)} candidatos "
+                 f"({len(features)} vetorizadores x {len(classifiers)} classificadores)")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [(vectorizer_params, features_dir, pool.submit(evaluate_candidate, str(features_dir), clf_params))
+                   for vectorizer_params, features_dir in features for clf_params in classifiers]
+        for vectorizer_params, features_dir, future in futures:
+            with open(features_dir / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            result = future.result()
+            result["vetorizador"] = vectorizer_params
+            result["n_features"] = meta["n_features"]
+            result["segundos_vetorizacao"] = meta["segundos_vetorizacao"]
+            results.append(result)
+
+    # Escolha pela validação; o teste é reportado, não usado para decidir
+    results.sort(key=lambda r: (r["val"]["f1"], r["val"]["acuracia"], -r["segundos_treino"]), reverse=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="sample_emails/dataset.json")
+    parser.add_argument("--grid", help="JSON com as chaves vetorizador e classificador ({parâmetro: [valores]})")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="processos usados na avaliação")
+    parser.add_argument("--cache-dir", default=".cache/features")
+    parser.add_argument("--output", default="metrics/search_results.json")
+    parser.add_argument("--apply", action="store_true", help="retreina e salva o modelo com a melhor configuração")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, "r", encoding="utf-8") as f:
+            grid = {**DEFAULT_GRID, **json.load(f)}
+
+    start = time.perf_counter()
+    results = search(args.dataset, grid, args.jobs, args.cache_dir)
+    elapsed = time.perf_counter() - start
+    best = results[0]
+    logging.info(f"Busca concluída em {elapsed:.2f}s. Melhor: {best['vetorizador']} {best['classificador']} "
+                 f"(validação F1 {best['val']['f1']:.4f}, teste F1 {best['test']['f1']:.4f})")
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"dataset": args.dataset, "segundos": round(elapsed, 3), "melhor": best, "candidatos": results},
+                  f, indent=2, ensure_ascii=False, default=list)
+    logging.info(f"Resultados salvos em {args.output}")
+
+    if args.apply:
+        train_and_evaluate(best["vetorizador"], best["classificador"], args.dataset)
+
+
+if __name__ == "__main__":
+    main()
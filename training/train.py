@@ -6,9 +6,8 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
-import joblib
-import os
-from pathlib import Path
+from model_io import save_model_atomic
+from export import export_compact, verify_compact
 
 # Garante stopwords
 try:
@@ -56,9 +55,11 @@ print(classification_report(y_test, y_pred, target_names=["Improdutivo", "Produt
 print("Matriz de confusão:")
 print(confusion_matrix(y_test, y_pred))
 
-# Cria diretório models se não existir
-Path("models").mkdir(exist_ok=True)
+# Save model (escrita atômica: o backend recarrega o arquivo automaticamente)
+save_model_atomic(pipeline, "models/model.joblib")
+print("\nModelo salvo em models/model.joblib")
 
-# Save model
-joblib.dump(pipeline, "models/model.joblib")
-print("\nModelo salvo em models/model.joblib")
\ No newline at end of file
+# Exporta o formato compacto (inferência sem scikit-learn) e confere a paridade
+compact_dir = export_compact(pipeline)
+verify_compact(pipeline, compact_dir, X_test)
+print(f"Modelo compacto salvo em {compact_dir}")
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+Treinamento out-of-core para bases grandes de emails rotulados.
+
+Lê um arquivo JSONL ({"text": ..., "label": "Produtivo" | "Improdutivo"} por
+linha) em blocos, anonimiza e limpa os textos num gerador e treina um
+HashingVectorizer (sem vocabulário em memória) com um SGDClassifier via
+partial_fit. A memória depende do tamanho do bloco e do número de features, não
+do tamanho da base. Uma fração determinística dos exemplos fica de fora para
+validação (com limite de tamanho) e a vazão é reportada em emails/segundo.
+
+Uso: python training/train_stream.py dados.jsonl [--chunk-size 10000]
+         [--n-features 1048576] [--epochs 1] [--holdout 0.05] [--output models/model.joblib]
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import nltk
+from nltk.corpus import stopwords
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, classification_report, f1_score
+from sklearn.pipeline import Pipeline
+
+from export import clear_compact
+from model_io import save_model_atomic
+from preprocessing import anonymize_text
+
+ROOT = Path(__file__).resolve().parent.parent
+# Modelo servido pelo backend; outros destinos não mexem no ponteiro do modelo compacto
+SERVED_MODEL = ROOT / "models" / "model.joblib"
+sys.path.insert(0, str(ROOT / "backend"))
+
+from utils.preprocessor import clean_text  # noqa: E402
+
+CLASSES = [0, 1]
+
+
+def iter_examples(path: str) -> Iterator[Tuple[str, int]]:
+    """Exemplos (texto limpo, rótulo binário) lidos linha a linha do JSONL."""
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                logging.warning(f"Linha {number} ignorada: JSON inválido ({e})")
+                continue
+            text = (item.get("text") or "").strip()
+            label = (item.get("label") or "").strip().lower()
+            if not text or not label:
+                continue
+            # Mesmo pré-processamento aplicado pelo backend antes da predição
+            yield clean_text(anonymize_text(text)), 1 if label.startswith("prod") else 0
+
+
+def iter_chunks(examples: Iterator[Tuple[str, int]], size: int) -> Iterator[List[Tuple[str, int]]]:
+    while True:
+        chunk = list(islice(examples, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def build_vectorizer(n_features: int) -> HashingVectorizer:
+    try:
+        nltk.data.find("corpora/stopwords")
+    except LookupError:
+        nltk.download("stopwords")
+    # As stopwords passam pela mesma limpeza dos textos (sem acentos)
+    stop_words = sorted({clean_text(word) for word in stopwords.words("portuguese") + stopwords.words("english")})
+    return HashingVectorizer(
+        n_features=n_features,
+        ngram_range=(1, 2),
+        stop_words=stop_words,
+        alternate_sign=False,
+        norm="l2",
+    )
+
+
+def train_stream(path: str, chunk_size: int = 10000, n_features: int = 2 ** 20, epochs: int = 1,
+                 holdout: float = 0.05, holdout_max: int = 50000, alpha: float = 1e-5):
+    """Treina o pipeline em blocos. Retorna (pipeline, métricas)."""
+    vectorizer = build_vectorizer(n_features)
+    clf = SGDClassifier(loss="log_loss", alpha=alpha, random_state=42)
+    # Um exemplo a cada `every` vai para a validação (mesmo conjunto em todas as épocas)
+    every = max(2, round(1 / holdout)) if holdout > 0 else 0
+    holdout_texts, holdout_labels = [], []
+
+    trained = 0
+    vectorize_seconds = fit_seconds = 0.0
+    start = time.perf_counter()
+    for epoch in range(epochs):
+        for chunk_number, chunk in enumerate(iter_chunks(iter_examples(path), chunk_size)):
+            texts, labels = [], []
+            for i, (text, label) in enumerate(chunk):
+                if every and (chunk_number * chunk_size + i) % every == 0:
+                    if epoch == 0 and len(holdout_texts) < holdout_max:
+                        holdout_texts.append(text)
+                        holdout_labels.append(label)
+                    continue
+                texts.append(text)
+                labels.append(label)
+            if not texts:
+                continue
+
+            t0 = time.perf_counter()
+            X = vectorizer.transform(texts)
+            t1 = time.perf_counter()
+            clf.partial_fit(X, labels, classes=CLASSES)
+            fit_seconds += time.perf_counter() - t1
+            vectorize_seconds += t1 - t0
+
+            trained += len(texts)
+            elapsed = time.perf_counter() - start
+            logging.info(f"Época {epoch + 1}, bloco {chunk_number + 1}: {trained} exemplos "
+                         f"({trained / elapsed:.0f} emails/s)")
+
+    elapsed = time.perf_counter() - start
+    if trained == 0:
+        raise ValueError(f"Nenhum exemplo de treino encontrado em {path}")
+
+    pipeline = Pipeline([("hash", vectorizer), ("clf", clf)])
+    metrics = {
+        "exemplos_treino": trained,
+        "exemplos_validacao": len(holdout_texts),
+        "epocas": epochs,
+        "n_features": n_features,
+        "segundos": round(elapsed, 3),
+        "emails_por_segundo": round(trained / elapsed, 1),
+        "segundos_vetorizacao": round(vectorize_seconds, 3),
+        "segundos_partial_fit": round(fit_seconds, 3),
+    }
+    if holdout_texts:
+        predicted = pipeline.predict(holdout_texts)
+        metrics["validacao"] = {
+            "acuracia": accuracy_score(holdout_labels, predicted),
+            "f1": f1_score(holdout_labels, predicted, zero_division=0),
+            "relatorio": classification_report(holdout_labels, predicted, output_dict=True, zero_division=0),
+        }
+    return pipeline, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", help="arquivo JSONL com campos text e label")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--n-features", type=int, default=2 ** 20)
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--holdout", type=float, default=0.05, help="fração dos exemplos usada na validação")
+    parser.add_argument("--holdout-max", type=int, default=50000)
+    parser.add_argument("--alpha", type=float, default=1e-5)
+    parser.add_argument("--output", default="models/model.joblib")
+    parser.add_argument("--metrics", default="metrics/stream_metrics.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    pipeline, metrics = train_stream(args.dataset, args.chunk_size, args.n_features, args.epochs,
+                                     args.holdout, args.holdout_max, args.alpha)
+    logging.info(f"Treino concluído: {metrics['exemplos_treino']} exemplos em {metrics['segundos']}s "
+                 f"({metrics['emails_por_segundo']} emails/s)")
+    if "validacao" in metrics:
+        logging.info(f"Validação - Acurácia: {metrics['validacao']['acuracia']:.4f}, "
+                     f"F1-Score: {metrics['validacao']['f1']:.4f}")
+
+    # Salva o modelo (escrita atômica: o backend recarrega o arquivo automaticamente)
+    save_model_atomic(pipeline, args.output)
+    logging.info(f"Modelo salvo em {args.output}")
+    if Path(args.output).resolve() == SERVED_MODEL.resolve():
+        # O formato compacto só cobre TF-IDF: remove o ponteiro para o backend usar este joblib
+        clear_compact()
+
+    Path(args.metrics).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.metrics, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2, ensure_ascii=False)
+    logging.info(f"Métricas salvas em {args.metrics}")
+
+
+if __name__ == "__main__":
+    main()